@@ -10,6 +10,8 @@ struct Execution: Codable, Identifiable {
     let output: String
     let exitCode: Int?
     let durationSeconds: Double?
+    // Listings carry only a preview of large outputs
+    let outputIsPreview: Bool?
 
     enum CodingKeys: String, CodingKey {
         case id
@@ -19,6 +21,7 @@ struct Execution: Codable, Identifiable {
         case status, prompt, output
         case exitCode = "exit_code"
         case durationSeconds = "duration_seconds"
+        case outputIsPreview = "output_is_preview"
     }
 
     var statusEmoji: String {
@@ -26,6 +29,9 @@ struct Execution: Codable, Identifiable {
         case "completed": return "✅"
         case "failed": return "❌"
         case "running": return "⏳"
+        case "queued": return "🕒"
+        case "skipped": return "⏭️"
+        case "cancelled": return "🛑"
         default: return "❓"
         }
     }
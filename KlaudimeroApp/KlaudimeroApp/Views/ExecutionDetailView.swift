@@ -2,7 +2,12 @@ import SwiftUI
 import MarkdownUI
 
 struct ExecutionDetailView: View {
-    let execution: Execution
+    @EnvironmentObject var api: APIClient
+    @State private var execution: Execution
+
+    init(execution: Execution) {
+        _execution = State(initialValue: execution)
+    }
 
     var body: some View {
         ScrollView {
@@ -55,9 +60,17 @@ struct ExecutionDetailView: View {
             }
             .padding()
         }
+        .task { await loadFullOutput() }
         .navigationTitle("Execution")
         #if os(iOS)
         .navigationBarTitleDisplayMode(.inline)
         #endif
     }
+
+    private func loadFullOutput() async {
+        // Rows from listings only carry a preview; fetch the full record
+        guard execution.outputIsPreview == true,
+              let full = try? await api.getExecution(execution.id) else { return }
+        execution = full
+    }
 }
@@ -137,7 +137,7 @@ struct HeartbeatView: View {
                     }
                     .contextMenu {
                         Button {
-                            copyToClipboard(execution.output)
+                            Task { await copyOutput(of: execution) }
                         } label: {
                             Label("Copy Output", systemImage: "doc.on.doc")
                         }
@@ -147,6 +147,12 @@ struct HeartbeatView: View {
         }
     }
 
+    private func copyOutput(of execution: Execution) async {
+        // Listings only carry a preview of large outputs; fetch the full record
+        let full = try? await api.getExecution(execution.id)
+        copyToClipboard(full?.output ?? execution.output)
+    }
+
     private func copyToClipboard(_ text: String) {
         #if os(iOS)
         UIPasteboard.general.string = text
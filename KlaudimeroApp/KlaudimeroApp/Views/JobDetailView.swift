@@ -64,7 +64,7 @@ struct JobDetailView: View {
                         }
                         .contextMenu {
                             Button {
-                                copyToClipboard(execution.output)
+                                Task { await copyOutput(of: execution) }
                             } label: {
                                 Label("Copy Output", systemImage: "doc.on.doc")
                             }
@@ -97,6 +97,12 @@ struct JobDetailView: View {
         }
     }
 
+    private func copyOutput(of execution: Execution) async {
+        // Listings only carry a preview of large outputs; fetch the full record
+        let full = try? await api.getExecution(execution.id)
+        copyToClipboard(full?.output ?? execution.output)
+    }
+
     private func copyToClipboard(_ text: String) {
         #if os(iOS)
         UIPasteboard.general.string = text
@@ -0,0 +1,114 @@
+"""Measure GET / latency while other clients hammer heavy listing endpoints.
+
+Storage calls from route handlers run in worker threads (klaudimero.storage.aio),
+so a slow listing should not delay unrelated requests on the event loop. This
+benchmark fills a throwaway storage directory, keeps several clients busy with
+execution and chat-session listings, and probes GET / in parallel, reporting
+the probe latency percentiles. Pass --inline to run storage calls directly on
+the event loop instead, for comparison.
+
+Requires httpx (not a service dependency):
+
+    python benchmarks/event_loop_latency.py --executions 20000 --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Storage paths are derived from $HOME at import time
+os.environ["HOME"] = tempfile.mkdtemp(prefix="klaudimero-bench-")
+atexit.register(shutil.rmtree, os.environ["HOME"], ignore_errors=True)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from klaudimero import storage  # noqa: E402
+from klaudimero.main import app  # noqa: E402
+from klaudimero.models import ChatMessage, ChatSession, Execution, ExecutionStatus  # noqa: E402
+
+
+def populate(executions: int, jobs: int, sessions: int) -> None:
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    for i in range(executions):
+        storage.save_execution(Execution(
+            job_id=f"job-{i % jobs}",
+            prompt="benchmark",
+            output="x" * 2000,
+            started_at=start + timedelta(seconds=i),
+            status=ExecutionStatus.completed,
+        ))
+    for i in range(sessions):
+        session = ChatSession(title=f"session {i}")
+        storage.append_chat_messages(
+            session, [ChatMessage(role="assistant", content="y" * 2000) for _ in range(50)]
+        )
+
+
+async def run(workers: int, duration: float) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = time.monotonic() + duration
+
+        async def heavy(n: int) -> None:
+            paths = ["/executions?limit=500", "/chat/sessions", "/jobs/job-0/executions?limit=500"]
+            i = n
+            while time.monotonic() < stop:
+                await client.get(paths[i % len(paths)])
+                i += 1
+
+        async def probe() -> list[float]:
+            # Latency is measured from when the probe was due, so time spent
+            # waiting for a blocked event loop to wake the probe counts too
+            latencies = []
+            while time.monotonic() < stop:
+                due = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                await client.get("/")
+                latencies.append((time.perf_counter() - due) * 1000)
+            return latencies
+
+        results = await asyncio.gather(probe(), *(heavy(n) for n in range(workers)))
+        return results[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--executions", type=int, default=20000)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--inline", action="store_true", help="run storage calls on the event loop")
+    args = parser.parse_args()
+
+    if args.inline:
+        async def inline(fn, /, *a, **kw):
+            return fn(*a, **kw)
+        asyncio.to_thread = inline
+
+    print(f"Populating {os.environ['HOME']} ...")
+    storage.init_storage()
+    populate(args.executions, args.jobs, args.sessions)
+
+    latencies = sorted(asyncio.run(run(args.workers, args.duration)))
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    mode = "inline" if args.inline else "offloaded"
+    print(
+        f"GET / ({mode}, {args.workers} listing clients): n={len(latencies)}"
+        f" p50={statistics.median(latencies):.2f}ms p99={p99:.2f}ms max={latencies[-1]:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
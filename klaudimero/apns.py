@@ -0,0 +1,161 @@
+"""The APNs client and push delivery.
+
+One aioapns client is shared by the whole process; see get_client. Sending
+and retries are driven by the notification outbox (see outbox).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+
+from pydantic import BaseModel
+
+from .config import APNS_CONFIG_FILE, load_apns_config
+
+logger = logging.getLogger("klaudimero.apns")
+
+# Requests in flight across all deliveries; aioapns multiplexes them over
+# its connections
+APNS_SEND_CONCURRENCY = 20
+
+# A request APNs has not answered by then counts as a retryable failure
+APNS_SEND_TIMEOUT_SECONDS = 30
+
+# Statuses worth retrying: expired provider token (aioapns signs a new one),
+# throttling, and server errors. Other rejections are final.
+_RETRYABLE_STATUSES = {"403", "429", "500", "503"}
+
+# Rejections meaning the device token will never work again (besides 410)
+_INVALID_TOKEN_REASONS = {"BadDeviceToken", "Unregistered", "DeviceTokenNotForTopic"}
+
+# The shared APNs client and what it was built from: the mtimes of
+# apns_config.json and of the key file it names
+_client = None
+_client_source: tuple | None = None
+_client_lock = asyncio.Lock()
+
+# Shared by every deliver() call, so concurrent outbox entries stay within
+# APNS_SEND_CONCURRENCY together
+_send_slots = asyncio.Semaphore(APNS_SEND_CONCURRENCY)
+
+
+def _read_key_file(key_file: str) -> str:
+    with open(key_file) as f:
+        return f.read()
+
+
+def _mtime(path) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def _load_client_source() -> tuple[tuple, dict | None, str | None]:
+    """Stat the APNs config and key file; read them only if they changed."""
+    config_mtime = _mtime(APNS_CONFIG_FILE)
+    if _client_source is not None and _client_source[0] == config_mtime:
+        key_file = _client_source[2]
+        source = (config_mtime, _mtime(key_file), key_file)
+        if source == _client_source:
+            return source, None, None
+    config = load_apns_config()
+    key_file = config.get("key_file") if config else None
+    source = (config_mtime, _mtime(key_file), key_file)
+    key = _read_key_file(key_file) if config and key_file and source[1] is not None else None
+    return source, config, key
+
+
+async def get_client():
+    """The process-wide APNs client, or None if push is not configured.
+
+    Built on first use and rebuilt when apns_config.json or its key file
+    changes, so the HTTP/2 connections and the signing token are reused
+    across events.
+    """
+    global _client, _client_source
+    async with _client_lock:
+        source, config, key = await asyncio.to_thread(_load_client_source)
+        if source == _client_source:
+            return _client
+
+        if _client is not None:
+            _client.pool.close()
+        _client, _client_source = None, source
+
+        if not config:
+            logger.debug("No APNs config found")
+            return None
+        try:
+            from aioapns import APNs
+        except ImportError:
+            logger.warning("aioapns not installed, push notifications are disabled")
+            return None
+        key_id = config.get("key_id")
+        team_id = config.get("team_id")
+        bundle_id = config.get("bundle_id")
+        if not all([key, key_id, team_id, bundle_id]):
+            logger.warning("Incomplete APNs config, push notifications are disabled")
+            return None
+
+        _client = APNs(
+            key=key,
+            key_id=key_id,
+            team_id=team_id,
+            topic=bundle_id,
+            use_sandbox=config.get("sandbox", False),
+        )
+        logger.info("APNs client ready")
+        return _client
+
+
+class DeliveryReport(BaseModel):
+    """Outcome of one deliver() call, by device token."""
+    delivered: list[str] = []
+    retry: dict[str, str] = {}  # token -> reason; worth sending again
+    rejected: dict[str, str] = {}  # token -> reason; final
+    invalid: list[str] = []  # rejected because the token itself is dead
+
+
+async def deliver(message: dict, tokens: list[str]) -> DeliveryReport:
+    """Send message to each device token.
+
+    At most APNS_SEND_CONCURRENCY requests are in flight at once across all
+    concurrent deliveries. Raises RuntimeError if push is not configured.
+    """
+    apns = await get_client()
+    if apns is None:
+        raise RuntimeError("APNs not configured")
+
+    from aioapns import NotificationRequest
+
+    report = DeliveryReport()
+
+    async def send(token: str) -> None:
+        try:
+            async with _send_slots:
+                response = await asyncio.wait_for(
+                    apns.send_notification(
+                        NotificationRequest(device_token=token, message=message)
+                    ),
+                    timeout=APNS_SEND_TIMEOUT_SECONDS,
+                )
+        except Exception as e:
+            report.retry[token] = f"{type(e).__name__}: {e}"
+            return
+        if response.is_successful:
+            report.delivered.append(token)
+            return
+        reason = f"{response.status} {response.description}"
+        if response.status in _RETRYABLE_STATUSES:
+            report.retry[token] = reason
+            return
+        logger.warning(f"APNs rejected push to {token[:8]}...: {reason}")
+        report.rejected[token] = reason
+        if response.status == "410" or response.description in _INVALID_TOKEN_REASONS:
+            report.invalid.append(token)
+
+    await asyncio.gather(*(send(token) for token in tokens))
+    return report
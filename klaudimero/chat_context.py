@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+
+from .config import CHAT_CONTEXT_RECENT_TURNS, CHAT_CONTEXT_TOKEN_BUDGET
+from .models import ChatMessage, ChatSession
+from .runner import run_claude
+
+logger = logging.getLogger("klaudimero.chat_context")
+
+SUMMARY_TIMEOUT_SECONDS = 300
+
+SUMMARY_PROMPT = """\
+You maintain the running summary of a conversation between a user and an \
+assistant. Update it with the new messages below. Keep facts, decisions, \
+open tasks, names, file paths and anything the user asked to remember; drop \
+pleasantries and detail that no longer matters. Reply with the updated \
+summary only, in at most {words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}"""
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough but cheap: about four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def user_text(msg: ChatMessage) -> str:
+    text = msg.content
+    for img_path in msg.images:
+        text += f"\n[Attached image: {img_path} — read this file to see the image]"
+    return text
+
+
+def render_transcript(messages: list[ChatMessage]) -> str:
+    parts = []
+    for msg in messages:
+        if msg.role == "user":
+            parts.append(f"User: {user_text(msg)}")
+        else:
+            parts.append(f"Assistant: {msg.content}")
+    return "\n\n".join(parts)
+
+
+def build_prompt(messages: list[ChatMessage], summary: str = "") -> str:
+    """Render the conversation as a transcript ending with an open assistant turn."""
+    prompt_parts = []
+    if summary:
+        prompt_parts.append(f"Summary of the earlier conversation:\n{summary}")
+    if messages:
+        prompt_parts.append(render_transcript(messages))
+    prompt_parts.append("Assistant:")
+    return "\n\n".join(prompt_parts)
+
+
+# Most words the summary may have, and roughly how many tokens that is
+SUMMARY_WORDS = max(100, CHAT_CONTEXT_TOKEN_BUDGET // 8)
+SUMMARY_TOKENS = SUMMARY_WORDS * 4 // 3
+
+# A single message counts for at most this many tokens: longer ones (e.g. a
+# job's full output) are cut in the middle, in replays and summary input
+MESSAGE_MAX_TOKENS = CHAT_CONTEXT_TOKEN_BUDGET // 4
+
+# Summary calls per replay. On a long thread that was never summarised, only
+# the newest batches are folded in and older messages are left out
+SUMMARY_MAX_BATCHES = 4
+
+
+def _clip(msg: ChatMessage) -> ChatMessage:
+    if estimate_tokens(user_text(msg)) <= MESSAGE_MAX_TOKENS:
+        return msg
+    half = MESSAGE_MAX_TOKENS * 2  # characters, at four per token
+    omitted = len(msg.content) - 2 * half
+    return msg.model_copy(update={
+        "content": f"{msg.content[:half]}\n[... {omitted} characters cut ...]\n{msg.content[-half:]}"
+    })
+
+
+def _message_tokens(msg: ChatMessage) -> int:
+    return estimate_tokens(user_text(_clip(msg)))
+
+
+def _history_budget(user_message: ChatMessage) -> int:
+    """Tokens left for replayed messages next to the summary and the new message."""
+    return max(
+        0, CHAT_CONTEXT_TOKEN_BUDGET - SUMMARY_TOKENS - estimate_tokens(user_text(user_message))
+    )
+
+
+def _summary_split(session: ChatSession, user_message: ChatMessage) -> int:
+    """Index of the first session message to keep verbatim.
+
+    Between CHAT_CONTEXT_RECENT_TURNS and twice that many turns are kept, so
+    the summary is updated in batches rather than on every turn, and more are
+    folded in while the verbatim part exceeds the token budget. The newest
+    message is always kept.
+    """
+    messages = session.messages
+    window = 2 * CHAT_CONTEXT_RECENT_TURNS
+    split = session.summary_through
+    if len(messages) - split > 2 * window:
+        split = len(messages) - window
+
+    tokens = [_message_tokens(m) for m in messages[split:]]
+    total = sum(tokens)
+    budget = _history_budget(user_message)
+    while total > budget and split < len(messages) - 1:
+        total -= tokens.pop(0)
+        split += 1
+    return split
+
+
+def _summary_batches(messages: list[ChatMessage]) -> list[list[ChatMessage]]:
+    """Split messages into runs whose transcript fits the token budget."""
+    batches: list[list[ChatMessage]] = []
+    budget = CHAT_CONTEXT_TOKEN_BUDGET - SUMMARY_TOKENS
+    tokens = 0
+    for msg in messages:
+        msg = _clip(msg)
+        size = estimate_tokens(user_text(msg))
+        if batches and tokens + size <= budget:
+            batches[-1].append(msg)
+            tokens += size
+        else:
+            batches.append([msg])
+            tokens = size
+    return batches
+
+
+async def _summarize(summary: str, messages: list[ChatMessage]) -> str:
+    prompt = SUMMARY_PROMPT.format(
+        words=SUMMARY_WORDS, summary=summary or "(none yet)", transcript=render_transcript(messages)
+    )
+    result = await run_claude(
+        prompt, ["--max-turns", "1"], label="summary", timeout=SUMMARY_TIMEOUT_SECONDS
+    )
+    if result.timed_out:
+        raise RuntimeError(f"summary timed out after {SUMMARY_TIMEOUT_SECONDS}s")
+    output = result.output.strip()
+    if result.returncode != 0 or not output:
+        raise RuntimeError(f"claude exited with code {result.returncode}: {output[:200]}")
+    return output
+
+
+async def _update_summary(session: ChatSession, split: int) -> None:
+    """Fold session.messages[summary_through:split] into the summary, one
+    budget-sized batch per claude call, saving progress after each batch."""
+    batches = _summary_batches(session.messages[session.summary_through:split])
+    if len(batches) > SUMMARY_MAX_BATCHES:
+        skipped = sum(len(batch) for batch in batches[:-SUMMARY_MAX_BATCHES])
+        logger.info(f"Leaving {skipped} old messages of chat {session.id} out of its summary")
+        session.summary_through += skipped
+        batches = batches[-SUMMARY_MAX_BATCHES:]
+    for batch in batches:
+        try:
+            session.context_summary = await _summarize(session.context_summary, batch)
+        except Exception as e:
+            logger.warning(f"Could not update summary for chat {session.id}: {e}")
+            return
+        session.summary_through += len(batch)
+
+
+async def build_replay_prompt(session: ChatSession, user_message: ChatMessage) -> str:
+    """Build a bounded prompt replaying the session for a new user message.
+
+    Older messages are replaced by session.context_summary, which is brought
+    up to date here when needed (the caller persists it with the session).
+    If summarising fails, the oldest unsummarised messages are dropped until
+    the rest fits the budget.
+    """
+    split = _summary_split(session, user_message)
+    if split > session.summary_through:
+        await _update_summary(session, split)
+
+    recent = [_clip(m) for m in session.messages[session.summary_through:]]
+    tokens = [estimate_tokens(user_text(m)) for m in recent]
+    total = sum(tokens)
+    budget = _history_budget(user_message)
+    while recent and total > budget:
+        total -= tokens.pop(0)
+        recent.pop(0)
+    return build_prompt([*recent, user_message], session.context_summary)
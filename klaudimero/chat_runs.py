@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Coroutine
+
+from .models import ChatRun, ChatRunStatus
+
+logger = logging.getLogger("klaudimero.chat_runs")
+
+# Finished runs are kept this long so clients can collect the result
+RUN_RETENTION = timedelta(hours=1)
+
+_runs: dict[str, ChatRun] = {}
+_tasks: dict[str, asyncio.Task] = {}
+
+
+def get_run(run_id: str) -> ChatRun | None:
+    return _runs.get(run_id)
+
+
+def list_runs(session_id: str) -> list[ChatRun]:
+    runs = [run for run in _runs.values() if run.session_id == session_id]
+    return sorted(runs, key=lambda run: run.started_at, reverse=True)
+
+
+def active_run(session_id: str) -> ChatRun | None:
+    for run in _runs.values():
+        if run.session_id == session_id and run.status == ChatRunStatus.running:
+            return run
+    return None
+
+
+def _prune() -> None:
+    cutoff = datetime.now(timezone.utc) - RUN_RETENTION
+    for run_id, run in list(_runs.items()):
+        if run.finished_at and run.finished_at < cutoff:
+            del _runs[run_id]
+
+
+def start_run(session_id: str, work: Coroutine[None, None, str]) -> ChatRun:
+    """Run a chat turn in the background, independent of any HTTP request.
+
+    work is the coroutine that runs Claude and persists the exchange; it
+    returns the assistant's response. The run is recorded in the registry and
+    its status and result are updated when work finishes.
+    """
+    _prune()
+    run = ChatRun(session_id=session_id)
+    task = asyncio.create_task(work)
+    _runs[run.id] = run
+    _tasks[run.id] = task
+
+    def _finished(task: asyncio.Task) -> None:
+        _tasks.pop(run.id, None)
+        run.finished_at = datetime.now(timezone.utc)
+        if task.cancelled():
+            run.status = ChatRunStatus.failed
+            run.error = "Cancelled"
+        elif task.exception() is not None:
+            e = task.exception()
+            run.status = ChatRunStatus.failed
+            run.error = str(getattr(e, "detail", None) or e)
+            logger.info(f"Chat run {run.id} for session {session_id} failed: {run.error}")
+        else:
+            run.status = ChatRunStatus.completed
+            run.response = task.result()
+
+    task.add_done_callback(_finished)
+    return run
+
+
+async def wait_for_run(run: ChatRun) -> str:
+    """Wait for a run's result, re-raising its exception if it failed.
+
+    Cancelling the waiter (e.g. the client disconnects) does not cancel the
+    run itself.
+    """
+    task = _tasks.get(run.id)
+    if task is None:
+        if run.status == ChatRunStatus.failed:
+            raise RuntimeError(run.error)
+        return run.response or ""
+    return await asyncio.shield(task)
@@ -6,19 +6,50 @@ from pathlib import Path
 BASE_DIR = Path(os.path.expanduser("~/.klaudimero"))
 JOBS_DIR = BASE_DIR / "jobs"
 EXECUTIONS_DIR = BASE_DIR / "executions"
+EXECUTION_INDEX_FILE = BASE_DIR / "execution_index.jsonl"
+OUTPUTS_DIR = BASE_DIR / "outputs"
 DEVICES_FILE = BASE_DIR / "devices.json"
+OUTBOX_DIR = BASE_DIR / "outbox"
 APNS_CONFIG_FILE = BASE_DIR / "apns_config.json"
 HEARTBEAT_CONFIG_FILE = BASE_DIR / "heartbeat_config.json"
 HEARTBEAT_PROMPT_FILE = BASE_DIR / "HEARTBEAT.md"
 HEARTBEAT_JOB_ID = "__heartbeat__"
 CHAT_SESSIONS_DIR = BASE_DIR / "chat_sessions"
+CHAT_INDEX_FILE = BASE_DIR / "chat_index.jsonl"
 UPLOADS_DIR = BASE_DIR / "uploads"
 WORKSPACE_DIR = BASE_DIR / "workspace"
 WORKSPACE_CLAUDE_MD = WORKSPACE_DIR / "CLAUDE.md"
+SQLITE_DB_FILE = BASE_DIR / "klaudimero.db"
+
+# Storage backend: "json" (one file per object) or "sqlite" (WAL database)
+STORAGE_BACKEND = os.environ.get("KLAUDIMERO_STORAGE", "json").lower()
+
+# Chat transcript replay: the newest turns are sent verbatim within a token
+# budget; older messages are folded into a rolling summary on the session
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get("KLAUDIMERO_CHAT_CONTEXT_TOKENS", "24000"))
+CHAT_CONTEXT_RECENT_TURNS = int(os.environ.get("KLAUDIMERO_CHAT_RECENT_TURNS", "10"))
+
+# How many claude processes (jobs, heartbeat, chat) may run at once
+MAX_CONCURRENT_EXECUTIONS = int(os.environ.get("KLAUDIMERO_MAX_CONCURRENT", "2"))
+
+# Default limit on a single claude run, in seconds
+CLAUDE_TIMEOUT_SECONDS = int(os.environ.get("KLAUDIMERO_CLAUDE_TIMEOUT", "3600"))
+
+# Push digest: job and heartbeat notifications raised within this many seconds
+# of the first one are sent as a single push (0 sends each one at once).
+# Failures skip the wait unless KLAUDIMERO_DIGEST_FAILURES is "true".
+NOTIFY_DIGEST_SECONDS = int(os.environ.get("KLAUDIMERO_DIGEST_SECONDS", "0"))
+NOTIFY_DIGEST_FAILURES = os.environ.get("KLAUDIMERO_DIGEST_FAILURES", "false").lower() == "true"
+
+# Default output kept in memory per claude run, in KB (its first and last
+# halves); job and heartbeat runs keep the full output on disk
+OUTPUT_CAP_KB = int(os.environ.get("KLAUDIMERO_OUTPUT_CAP_KB", "512"))
 
 # Ensure directories exist
 JOBS_DIR.mkdir(parents=True, exist_ok=True)
 EXECUTIONS_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
+OUTBOX_DIR.mkdir(parents=True, exist_ok=True)
 CHAT_SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
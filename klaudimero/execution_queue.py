@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from enum import IntEnum
+from typing import AsyncIterator
+
+from .config import MAX_CONCURRENT_EXECUTIONS
+from .models import QueueEntry, QueueStatus
+
+logger = logging.getLogger("klaudimero.execution_queue")
+
+
+class Priority(IntEnum):
+    """Lower values are started first."""
+    chat = 0
+    manual = 1
+    scheduled = 2
+    heartbeat = 3
+
+
+class ExecutionQueue:
+    """Bounds how many claude processes run at once.
+
+    Callers hold a slot for the duration of a run. When all slots are taken,
+    waiters are started in priority order, first come first served within a
+    priority.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self._running: dict[str, QueueEntry] = {}
+        self._waiting: list[tuple[int, int, QueueEntry, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def _start(self, entry: QueueEntry) -> None:
+        entry.state = "running"
+        entry.started_at = datetime.now(timezone.utc)
+        self._running[entry.id] = entry
+
+    def _release(self, entry: QueueEntry) -> None:
+        self._running.pop(entry.id, None)
+        while self._waiting and len(self._running) < self.limit:
+            _, _, waiter, future = heapq.heappop(self._waiting)
+            if future.cancelled():
+                continue
+            self._start(waiter)
+            future.set_result(None)
+
+    async def _acquire(self, entry: QueueEntry, priority: Priority) -> None:
+        if len(self._running) < self.limit and not self._waiting:
+            self._start(entry)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._seq), entry, future))
+        logger.info(f"Queued {entry.kind} {entry.label!r} ({len(self._waiting)} waiting)")
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry.id in self._running:
+                # Granted a slot just as we were cancelled: hand it on
+                self._release(entry)
+            else:
+                self._waiting = [w for w in self._waiting if w[2] is not entry]
+                heapq.heapify(self._waiting)
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority, label: str, ref_id: str | None = None
+    ) -> AsyncIterator[float]:
+        """Hold an execution slot; yields the seconds spent waiting for it."""
+        entry = QueueEntry(kind=priority.name, label=label, ref_id=ref_id)
+        waited_from = time.monotonic()
+        await self._acquire(entry, priority)
+        try:
+            yield time.monotonic() - waited_from
+        finally:
+            self._release(entry)
+
+    def status(self) -> QueueStatus:
+        waiting = [entry for _, _, entry, future in sorted(self._waiting) if not future.cancelled()]
+        running = sorted(self._running.values(), key=lambda entry: entry.started_at)
+        return QueueStatus(limit=self.limit, running=running, waiting=waiting)
+
+
+_queue = ExecutionQueue(MAX_CONCURRENT_EXECUTIONS)
+
+
+def slot(priority: Priority, label: str, ref_id: str | None = None):
+    """Hold a slot in the global execution queue (an async context manager)."""
+    return _queue.slot(priority, label, ref_id)
+
+
+def queue_status() -> QueueStatus:
+    return _queue.status()
@@ -2,84 +2,200 @@ from __future__ import annotations
 
 import asyncio
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
-from .config import WORKSPACE_DIR
+from . import execution_queue
+from .config import CLAUDE_TIMEOUT_SECONDS, OUTPUT_CAP_KB
+from .execution_queue import Priority
 from .models import ChatMessage, ChatSession, Execution, ExecutionStatus, Job
-from .storage import load_chat_session, save_chat_session, save_execution, save_job
+from .runner import RunResult, cancel_run, cancellable, run_claude
+from .storage import aio
+from .streams import finish_capture, live_output
 
 
-async def run_job(job: Job) -> Execution:
-    from .notifications import notify_job_event
+# Overlap policy state: runs per job that are waiting or running (claimed),
+# runs per job that are running, and mutex groups with a running job.
+_claimed: dict[str, int] = {}
+_running: dict[str, int] = {}
+_busy_groups: set[str] = set()
+_overlap_changed = asyncio.Condition()
+
+
+def _may_start(job: Job) -> bool:
+    if _running.get(job.id, 0) >= job.max_concurrent:
+        return False
+    return not (job.mutex_group and job.mutex_group in _busy_groups)
+
 
+@asynccontextmanager
+async def _overlap_turn(job: Job):
+    """Wait until the job's overlap policy lets this run start, and hold it."""
+    async with _overlap_changed:
+        await _overlap_changed.wait_for(lambda: _may_start(job))
+        _running[job.id] = _running.get(job.id, 0) + 1
+        if job.mutex_group:
+            _busy_groups.add(job.mutex_group)
+    try:
+        yield
+    finally:
+        async with _overlap_changed:
+            _running[job.id] -= 1
+            if not _running[job.id]:
+                del _running[job.id]
+            if job.mutex_group:
+                _busy_groups.discard(job.mutex_group)
+            _overlap_changed.notify_all()
+
+
+async def record_skipped_run(
+    job: Job, reason: str, scheduled_at: datetime | None = None
+) -> Execution:
+    """Record a run that was not started, as a skipped execution."""
+    now = datetime.now(timezone.utc)
     execution = Execution(
         job_id=job.id,
         prompt=job.prompt,
-        status=ExecutionStatus.running,
+        status=ExecutionStatus.skipped,
+        started_at=scheduled_at or now,
+        finished_at=now,
+        output=reason,
     )
-    save_execution(execution)
+    await aio.save_execution(execution)
+    return execution
 
-    if "started" in job.notify_on:
-        await notify_job_event(job, execution, "started")
 
-    start = time.monotonic()
+async def run_job(job: Job, priority: Priority = Priority.scheduled) -> Execution:
+    """Run a job, subject to its overlap policy.
 
+    If the job already has max_concurrent runs waiting or running, the run is
+    skipped when the job coalesces and waits otherwise. Runs of jobs in the
+    same mutex group wait for each other. The run can be stopped with
+    cancel_execution at any point.
+    """
+    claimed = _claimed.get(job.id, 0)
+    if job.coalesce and claimed >= job.max_concurrent:
+        return await record_skipped_run(
+            job, f"Skipped: {claimed} run(s) of this job already running or waiting"
+        )
+    _claimed[job.id] = claimed + 1
     try:
-        cmd = [
-            "claude",
-            "-p",
-            job.prompt,
-            "--output-format", "text",
-            "--max-turns", str(job.max_turns),
-            "--dangerously-skip-permissions",
-        ]
-
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            cwd=str(WORKSPACE_DIR),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.STDOUT,
+        execution = Execution(
+            job_id=job.id,
+            prompt=job.prompt,
+            status=ExecutionStatus.queued,
         )
+        await aio.save_execution(execution)
+        try:
+            async with cancellable(execution.id):
+                return await _run_job(job, execution, priority)
+        except asyncio.CancelledError:
+            # Cancelled before claude started (or the server is shutting down)
+            await asyncio.shield(record_cancelled(execution))
+            raise
+    finally:
+        _claimed[job.id] -= 1
+        if not _claimed[job.id]:
+            del _claimed[job.id]
+
+
+async def record_cancelled(execution: Execution) -> None:
+    """Record an execution that was cancelled before its run finished."""
+    execution.status = ExecutionStatus.cancelled
+    execution.finished_at = datetime.now(timezone.utc)
+    await aio.save_execution(execution)
+    await finish_capture(execution.id)
+
+
+async def record_output(execution: Execution, result: RunResult) -> None:
+    """Set the execution's output and exit code from its run.
+
+    If the run kept only the head and tail of its output, the full output
+    captured in the live output file is stored for the execution instead.
+    """
+    execution.output = result.output
+    execution.exit_code = result.returncode
+    if result.stats.truncated:
+        await aio.store_live_output(execution)
+
+
+async def cancel_execution(execution_id: str) -> bool:
+    """Cancel a queued or running job or heartbeat execution.
+
+    Returns False if it is not active in this process.
+    """
+    return await cancel_run(execution_id)
+
+
+async def _run_job(job: Job, execution: Execution, priority: Priority) -> Execution:
+    from .notifications import notify_job_event
+
+    queued_at = time.monotonic()
+
+    async with _overlap_turn(job), execution_queue.slot(priority, job.name, execution.id):
+        execution.queue_wait_seconds = round(time.monotonic() - queued_at, 2)
+        execution.status = ExecutionStatus.running
+        await aio.save_execution(execution)
+
+        if "started" in job.notify_on:
+            await notify_job_event(job, execution, "started")
+
+        start = time.monotonic()
 
         try:
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=3600)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
+            timeout = job.timeout_seconds or CLAUDE_TIMEOUT_SECONDS
+            result = await run_claude(
+                job.prompt,
+                ["--max-turns", str(job.max_turns), "--dangerously-skip-permissions"],
+                label=f"job {job.name!r}",
+                timeout=timeout,
+                max_output_bytes=(job.output_cap_kb or OUTPUT_CAP_KB) * 1024,
+                on_output=live_output(execution.id),
+                run_id=execution.id,
+            )
+            if result.cancelled:
+                execution.status = ExecutionStatus.cancelled
+                await record_output(execution, result)
+            elif result.timed_out:
+                execution.status = ExecutionStatus.failed
+                execution.output = f"Execution timed out after {timeout}s"
+                execution.exit_code = -1
+            else:
+                await record_output(execution, result)
+                execution.status = (
+                    ExecutionStatus.completed if result.returncode == 0 else ExecutionStatus.failed
+                )
+        except Exception as e:
             execution.status = ExecutionStatus.failed
-            execution.output = "Execution timed out after 1 hour"
+            execution.output = f"Error launching process: {e}"
             execution.exit_code = -1
-        else:
-            execution.output = stdout.decode("utf-8", errors="replace") if stdout else ""
-            execution.exit_code = proc.returncode
-            execution.status = (
-                ExecutionStatus.completed if proc.returncode == 0 else ExecutionStatus.failed
-            )
-    except Exception as e:
-        execution.status = ExecutionStatus.failed
-        execution.output = f"Error launching process: {e}"
-        execution.exit_code = -1
 
     elapsed = time.monotonic() - start
     execution.duration_seconds = round(elapsed, 2)
     execution.finished_at = datetime.now(timezone.utc)
-    save_execution(execution)
+    await aio.save_execution(execution)
+    await finish_capture(execution.id)
 
     # Append output to job's chat thread
-    _append_to_job_thread(job, execution)
+    await _append_to_job_thread(job, execution)
 
     event = "completed" if execution.status == ExecutionStatus.completed else "failed"
-    if event in job.notify_on:
+    if execution.status != ExecutionStatus.cancelled and event in job.notify_on:
         await notify_job_event(job, execution, event)
 
     return execution
 
 
-def _append_to_job_thread(job: Job, execution: Execution) -> None:
+async def _append_to_job_thread(job: Job, execution: Execution) -> None:
     """Create or load the job's chat session and append the execution output."""
     session = None
     if job.chat_session_id:
-        session = load_chat_session(job.chat_session_id)
+        session = await aio.load_chat_session(job.chat_session_id, message_limit=0)
+    if not session:
+        session = await aio.find_chat_session_by_source("job", job.id)
+        if session:
+            job.chat_session_id = session.id
+            await aio.save_job(job)
 
     if not session:
         session = ChatSession(
@@ -89,8 +205,8 @@ def _append_to_job_thread(job: Job, execution: Execution) -> None:
             messages=[ChatMessage(role="user", content=job.prompt)],
         )
         job.chat_session_id = session.id
-        save_job(job)
+        await aio.save_job(job)
 
-    session.messages.append(ChatMessage(role="assistant", content=execution.output))
-    session.updated_at = datetime.now(timezone.utc)
-    save_chat_session(session)
+    await aio.append_chat_messages(
+        session, [ChatMessage(role="assistant", content=execution.output)]
+    )
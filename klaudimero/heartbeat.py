@@ -7,18 +7,14 @@ from datetime import datetime, timezone
 
 from apscheduler.triggers.interval import IntervalTrigger
 
-from .config import HEARTBEAT_JOB_ID, WORKSPACE_DIR
+from . import execution_queue
+from .config import CLAUDE_TIMEOUT_SECONDS, HEARTBEAT_JOB_ID
+from .execution_queue import Priority
 from .models import ChatMessage, ChatSession, Execution, ExecutionStatus, HeartbeatConfig
-from .storage import (
-    cleanup_old_executions,
-    load_chat_session,
-    load_heartbeat_config,
-    load_heartbeat_prompt,
-    save_chat_session,
-    save_heartbeat_config,
-    save_heartbeat_prompt,
-    save_execution,
-)
+from .executor import record_cancelled, record_output
+from .runner import cancellable, run_claude
+from .storage import aio, load_heartbeat_prompt, save_heartbeat_prompt
+from .streams import finish_capture, live_output
 
 logger = logging.getLogger("klaudimero.heartbeat")
 
@@ -28,7 +24,6 @@ DEFAULT_HEARTBEAT_PROMPT = """\
 You are the Klaudimero heartbeat agent. The user's timezone is Europe/Berlin.
 
 Rules:
-- If it is between 22:00 and 08:00 in the user's timezone, skip all tasks and go straight to the status line.
 - Do not repeatedly notify about the same thing. Check recent heartbeat executions first: curl -s http://localhost:8585/heartbeat/executions?limit=5
 - Only notify about things the user needs to know or act on. Routine checks passing is NOT worth notifying.
 
@@ -55,75 +50,80 @@ def ensure_heartbeat_prompt() -> None:
         logger.info("Created default HEARTBEAT.md")
 
 
-async def run_heartbeat() -> Execution:
+async def run_heartbeat(priority: Priority = Priority.heartbeat) -> Execution:
     """Run a heartbeat execution. Uses a lock to prevent concurrent runs."""
     from .notifications import notify_heartbeat_event
 
     async with _heartbeat_lock:
         # Clean up execution logs older than 3 days
-        removed = cleanup_old_executions(max_age_days=3)
+        removed = await aio.cleanup_old_executions(max_age_days=3)
         if removed:
             logger.info(f"Cleaned up {removed} old execution logs")
 
-        user_prompt = load_heartbeat_prompt()
+        user_prompt = await aio.load_heartbeat_prompt()
         full_prompt = user_prompt + HEARTBEAT_SUFFIX
-        config = load_heartbeat_config()
+        config = await aio.load_heartbeat_config()
 
         execution = Execution(
             job_id=HEARTBEAT_JOB_ID,
             prompt=user_prompt,
-            status=ExecutionStatus.running,
+            status=ExecutionStatus.queued,
         )
-        save_execution(execution)
-
-        start = time.monotonic()
+        await aio.save_execution(execution)
 
         try:
-            cmd = [
-                "claude",
-                "-p",
-                full_prompt,
-                "--output-format", "text",
-                "--max-turns", str(config.max_turns),
-                "--dangerously-skip-permissions",
-            ]
-
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=str(WORKSPACE_DIR),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-            )
-
-            try:
-                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=3600)
-            except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
-                execution.status = ExecutionStatus.failed
-                execution.output = "Heartbeat timed out after 1 hour"
-                execution.exit_code = -1
-            else:
-                execution.output = stdout.decode("utf-8", errors="replace") if stdout else ""
-                execution.exit_code = proc.returncode
-                execution.status = (
-                    ExecutionStatus.completed if proc.returncode == 0 else ExecutionStatus.failed
-                )
-        except Exception as e:
-            execution.status = ExecutionStatus.failed
-            execution.output = f"Error launching process: {e}"
-            execution.exit_code = -1
+            async with cancellable(execution.id), execution_queue.slot(
+                priority, "Heartbeat", execution.id
+            ) as waited:
+                execution.queue_wait_seconds = round(waited, 2)
+                execution.status = ExecutionStatus.running
+                await aio.save_execution(execution)
+
+                start = time.monotonic()
+
+                try:
+                    result = await run_claude(
+                        full_prompt,
+                        ["--max-turns", str(config.max_turns), "--dangerously-skip-permissions"],
+                        label="heartbeat",
+                        on_output=live_output(execution.id),
+                        run_id=execution.id,
+                    )
+                    if result.cancelled:
+                        execution.status = ExecutionStatus.cancelled
+                        await record_output(execution, result)
+                    elif result.timed_out:
+                        execution.status = ExecutionStatus.failed
+                        execution.output = f"Heartbeat timed out after {CLAUDE_TIMEOUT_SECONDS}s"
+                        execution.exit_code = -1
+                    else:
+                        await record_output(execution, result)
+                        execution.status = (
+                            ExecutionStatus.completed
+                            if result.returncode == 0
+                            else ExecutionStatus.failed
+                        )
+                except Exception as e:
+                    execution.status = ExecutionStatus.failed
+                    execution.output = f"Error launching process: {e}"
+                    execution.exit_code = -1
+        except asyncio.CancelledError:
+            # Cancelled before claude started (or the server is shutting down)
+            await asyncio.shield(record_cancelled(execution))
+            raise
 
         elapsed = time.monotonic() - start
         execution.duration_seconds = round(elapsed, 2)
         execution.finished_at = datetime.now(timezone.utc)
-        save_execution(execution)
+        await aio.save_execution(execution)
 
         # Parse status code from output and strip it
         output = execution.output.strip()
         should_notify = False
         if execution.status == ExecutionStatus.failed:
             should_notify = True
+        elif execution.status == ExecutionStatus.cancelled:
+            pass  # stopped on request, nothing to report
         elif output.endswith("STATUS:NOTIFY"):
             output = output[: -len("STATUS:NOTIFY")].strip()
             should_notify = True
@@ -131,10 +131,11 @@ async def run_heartbeat() -> Execution:
             output = output[: -len("STATUS:OK")].strip()
 
         execution.output = output
-        save_execution(execution)
+        await aio.save_execution(execution)
+        await finish_capture(execution.id)
 
         # Append output to heartbeat chat thread
-        _append_to_heartbeat_thread(config, execution)
+        await _append_to_heartbeat_thread(config, execution)
 
         if should_notify:
             event = "completed" if execution.status != ExecutionStatus.failed else "failed"
@@ -143,11 +144,16 @@ async def run_heartbeat() -> Execution:
         return execution
 
 
-def _append_to_heartbeat_thread(config: HeartbeatConfig, execution: Execution) -> None:
+async def _append_to_heartbeat_thread(config: HeartbeatConfig, execution: Execution) -> None:
     """Create or load the heartbeat's chat session and append the execution output."""
     session = None
     if config.chat_session_id:
-        session = load_chat_session(config.chat_session_id)
+        session = await aio.load_chat_session(config.chat_session_id, message_limit=0)
+    if not session:
+        session = await aio.find_chat_session_by_source("heartbeat", HEARTBEAT_JOB_ID)
+        if session:
+            config.chat_session_id = session.id
+            await aio.save_heartbeat_config(config)
 
     if not session:
         session = ChatSession(
@@ -156,21 +162,28 @@ def _append_to_heartbeat_thread(config: HeartbeatConfig, execution: Execution) -
             source_id=HEARTBEAT_JOB_ID,
         )
         config.chat_session_id = session.id
-        save_heartbeat_config(config)
+        await aio.save_heartbeat_config(config)
 
-    session.messages.append(ChatMessage(role="assistant", content=execution.output))
-    session.updated_at = datetime.now(timezone.utc)
-    save_chat_session(session)
+    await aio.append_chat_messages(
+        session, [ChatMessage(role="assistant", content=execution.output)]
+    )
 
 
 def schedule_heartbeat(config: HeartbeatConfig) -> None:
-    """Add heartbeat to the scheduler with an interval trigger."""
-    from .scheduler import get_scheduler
+    """Add heartbeat to the scheduler with an interval trigger.
+
+    Runs that fall in the config's quiet hours are skipped without starting
+    claude.
+    """
+    from .scheduler import get_scheduler, in_quiet_hours
 
     scheduler = get_scheduler()
     trigger = IntervalTrigger(minutes=config.interval_minutes)
 
     async def runner():
+        if in_quiet_hours(config.quiet_hours):
+            logger.info("Skipping heartbeat: quiet hours")
+            return
         await run_heartbeat()
 
     scheduler.add_job(
@@ -4,7 +4,7 @@ import logging
 from fastapi import FastAPI
 
 from .scheduler import get_scheduler, load_and_schedule_all_jobs
-from .routers import jobs, executions, devices, heartbeat, chat, soul
+from .routers import jobs, executions, devices, heartbeat, chat, soul, queue, notifications
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,8 +15,12 @@ logging.basicConfig(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     from .heartbeat import ensure_heartbeat_prompt, schedule_heartbeat
+    from .notifications import flush_digest
+    from .outbox import start_dispatcher, stop_dispatcher
     from .soul import ensure_soul_prompt
-    from .storage import load_heartbeat_config
+    from .storage import init_storage, load_heartbeat_config
+
+    init_storage()
 
     scheduler = get_scheduler()
     load_and_schedule_all_jobs()
@@ -30,8 +34,12 @@ async def lifespan(app: FastAPI):
 
     scheduler.start()
     logging.getLogger("klaudimero").info("Scheduler started")
+    start_dispatcher()
     yield
     scheduler.shutdown()
+    # Held digest events go to the outbox and are sent after the next start
+    await flush_digest()
+    await stop_dispatcher()
     logging.getLogger("klaudimero").info("Scheduler shut down")
 
 
@@ -43,6 +51,8 @@ app.include_router(devices.router)
 app.include_router(heartbeat.router)
 app.include_router(chat.router)
 app.include_router(soul.router)
+app.include_router(queue.router)
+app.include_router(notifications.router)
 
 
 @app.get("/")
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, time, timezone
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 def _utcnow() -> datetime:
@@ -16,6 +16,28 @@ def _new_id() -> str:
     return str(uuid.uuid4())
 
 
+# --- Quiet hours ---
+
+class QuietHours(BaseModel):
+    """A daily window, in the user's timezone, in which scheduled runs are
+    skipped. Wraps past midnight when end is before start."""
+    start: str = Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")  # "HH:MM", inclusive
+    end: str = Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")  # "HH:MM", exclusive
+
+    @model_validator(mode="after")
+    def _not_empty(self) -> QuietHours:
+        if self.start == self.end:
+            raise ValueError("quiet hours start and end must differ")
+        return self
+
+    def contains(self, t: time) -> bool:
+        start = time.fromisoformat(self.start)
+        end = time.fromisoformat(self.end)
+        if start < end:
+            return start <= t < end
+        return t >= start or t < end
+
+
 # --- Job ---
 
 class JobCreate(BaseModel):
@@ -25,6 +47,13 @@ class JobCreate(BaseModel):
     enabled: bool = True
     max_turns: int = 50
     notify_on: list[str] = Field(default_factory=lambda: ["completed", "failed"])
+    max_concurrent: int = Field(1, ge=1)
+    coalesce: bool = True
+    misfire_grace_seconds: Optional[int] = Field(60, ge=1)
+    mutex_group: Optional[str] = None
+    timeout_seconds: Optional[int] = Field(None, ge=1)
+    output_cap_kb: Optional[int] = Field(None, ge=1)
+    quiet_hours: list[QuietHours] = Field(default_factory=list)
 
 
 class JobUpdate(BaseModel):
@@ -34,6 +63,13 @@ class JobUpdate(BaseModel):
     enabled: Optional[bool] = None
     max_turns: Optional[int] = None
     notify_on: Optional[list[str]] = None
+    max_concurrent: Optional[int] = Field(None, ge=1)
+    coalesce: Optional[bool] = None
+    misfire_grace_seconds: Optional[int] = Field(None, ge=1)
+    mutex_group: Optional[str] = None
+    timeout_seconds: Optional[int] = Field(None, ge=1)
+    output_cap_kb: Optional[int] = Field(None, ge=1)
+    quiet_hours: Optional[list[QuietHours]] = None
 
 
 class Job(BaseModel):
@@ -44,6 +80,17 @@ class Job(BaseModel):
     enabled: bool = True
     max_turns: int = 50
     notify_on: list[str] = Field(default_factory=lambda: ["completed", "failed"])
+    # Overlap policy. At most max_concurrent runs of the job at once; further
+    # runs are skipped if coalesce is set, otherwise they wait. Runs of jobs
+    # sharing a mutex_group never overlap. Scheduled runs later than
+    # misfire_grace_seconds are skipped (None: run however late).
+    max_concurrent: int = 1
+    coalesce: bool = True
+    misfire_grace_seconds: Optional[int] = 60
+    mutex_group: Optional[str] = None
+    timeout_seconds: Optional[int] = None  # None: KLAUDIMERO_CLAUDE_TIMEOUT
+    output_cap_kb: Optional[int] = None  # None: KLAUDIMERO_OUTPUT_CAP_KB
+    quiet_hours: list[QuietHours] = Field(default_factory=list)  # scheduled runs only
     chat_session_id: Optional[str] = None
     created_at: datetime = Field(default_factory=_utcnow)
     updated_at: datetime = Field(default_factory=_utcnow)
@@ -52,9 +99,12 @@ class Job(BaseModel):
 # --- Execution ---
 
 class ExecutionStatus(str, Enum):
+    queued = "queued"
     running = "running"
     completed = "completed"
     failed = "failed"
+    skipped = "skipped"
+    cancelled = "cancelled"
 
 
 class Execution(BaseModel):
@@ -65,18 +115,45 @@ class Execution(BaseModel):
     status: ExecutionStatus = ExecutionStatus.running
     prompt: str
     output: str = ""
+    # Large outputs are stored compressed outside the record; output then only
+    # holds a preview and the full text is served by /executions/{id}/output
+    output_is_preview: bool = False
+    output_size: Optional[int] = None  # bytes, UTF-8
+    output_sha256: Optional[str] = None
     exit_code: Optional[int] = None
     duration_seconds: Optional[float] = None
+    queue_wait_seconds: Optional[float] = None
 
 
-# --- Device ---
+# --- Execution queue ---
+
+class QueueEntry(BaseModel):
+    id: str = Field(default_factory=_new_id)
+    kind: str  # "chat", "manual", "scheduled" or "heartbeat"
+    label: str
+    ref_id: Optional[str] = None  # execution id, or chat session id for chat
+    state: str = "waiting"  # "waiting" or "running"
+    enqueued_at: datetime = Field(default_factory=_utcnow)
+    started_at: Optional[datetime] = None
+
+
+class QueueStatus(BaseModel):
+    limit: int
+    running: list[QueueEntry]
+    waiting: list[QueueEntry]
+
 
 # --- Heartbeat ---
 
+def _default_heartbeat_quiet_hours() -> list[QuietHours]:
+    return [QuietHours(start="22:00", end="08:00")]
+
+
 class HeartbeatConfig(BaseModel):
     enabled: bool = False
     interval_minutes: int = 30
     max_turns: int = 50
+    quiet_hours: list[QuietHours] = Field(default_factory=_default_heartbeat_quiet_hours)
     chat_session_id: Optional[str] = None
 
 
@@ -84,6 +161,7 @@ class HeartbeatConfigUpdate(BaseModel):
     enabled: Optional[bool] = None
     interval_minutes: Optional[int] = None
     max_turns: Optional[int] = None
+    quiet_hours: Optional[list[QuietHours]] = None
     prompt: Optional[str] = None
 
 
@@ -91,6 +169,7 @@ class HeartbeatStatus(BaseModel):
     enabled: bool
     interval_minutes: int
     max_turns: int
+    quiet_hours: list[QuietHours]
     prompt: str
 
 
@@ -105,6 +184,32 @@ class Device(BaseModel):
     token: str
     name: Optional[str] = None
     registered_at: datetime = Field(default_factory=_utcnow)
+    # Push delivery stats
+    delivered: int = 0
+    failed: int = 0
+    consecutive_failures: int = 0
+    last_delivered_at: Optional[datetime] = None
+    last_failed_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+
+# --- Notification outbox ---
+
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    dead = "dead"
+
+
+class OutboxEntry(BaseModel):
+    """A push notification waiting for delivery; removed once delivered."""
+    id: str = Field(default_factory=_new_id)
+    message: dict  # APNs payload
+    tokens: list[str]  # devices it has not been delivered to yet
+    status: OutboxStatus = OutboxStatus.pending
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=_utcnow)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=_utcnow)
 
 
 # --- Chat ---
@@ -128,5 +233,38 @@ class ChatSession(BaseModel):
     messages: list[ChatMessage] = []
     source_type: Optional[str] = None  # "job", "heartbeat", or None for regular chat
     source_id: Optional[str] = None    # job_id or "__heartbeat__"
+    # Claude CLI session continued with --resume, and how many of this
+    # session's messages it has seen
+    claude_session_id: Optional[str] = None
+    claude_session_messages: int = 0
+    # Rolling summary of messages[:summary_through], used when replaying
+    # the transcript instead of resuming
+    context_summary: str = ""
+    summary_through: int = 0
     created_at: datetime = Field(default_factory=_utcnow)
     updated_at: datetime = Field(default_factory=_utcnow)
+
+
+class ChatSessionSummary(BaseModel):
+    id: str
+    title: str = ""
+    source_type: Optional[str] = None
+    source_id: Optional[str] = None
+    updated_at: datetime
+    message_count: int = 0
+
+
+class ChatRunStatus(str, Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class ChatRun(BaseModel):
+    id: str = Field(default_factory=_new_id)
+    session_id: str
+    status: ChatRunStatus = ChatRunStatus.running
+    started_at: datetime = Field(default_factory=_utcnow)
+    finished_at: Optional[datetime] = None
+    response: Optional[str] = None
+    error: Optional[str] = None
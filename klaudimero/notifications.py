@@ -1,42 +1,96 @@
+"""Push notifications for job and heartbeat events.
+
+Events are turned into APNs payloads and handed to the outbox, which
+delivers them in the background. With NOTIFY_DIGEST_SECONDS set, events are
+held for that long after the first one and sent as one digest push.
+"""
+
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
+from collections import Counter
 
-from .config import load_apns_config
+from . import outbox
+from .config import NOTIFY_DIGEST_FAILURES, NOTIFY_DIGEST_SECONDS
 from .models import Execution, Job
-from .storage import load_all_devices
 
 logger = logging.getLogger("klaudimero.notifications")
 
+# Job names listed in a digest before it says "+N more"
+DIGEST_MAX_NAMES = 5
 
-async def notify_job_event(job: Job, execution: Execution, event: str) -> None:
-    """Send push notification to all registered devices."""
-    apns_config = load_apns_config()
-    if not apns_config:
-        logger.debug("No APNs config found, skipping notification")
-        return
+# Events held for the current digest window, as (name, event, message) where
+# name is the job name or None for the heartbeat
+_held: list[tuple[str | None, str, dict]] = []
+_digest_timer: asyncio.Task | None = None
 
-    devices = load_all_devices()
-    if not devices:
-        logger.debug("No registered devices, skipping notification")
-        return
 
-    try:
-        from aioapns import APNs, NotificationRequest
-    except ImportError:
-        logger.warning("aioapns not installed, skipping push notifications")
+async def _notify(name: str | None, event: str, message: dict) -> None:
+    global _digest_timer
+    if NOTIFY_DIGEST_SECONDS <= 0 or (event == "failed" and not NOTIFY_DIGEST_FAILURES):
+        await outbox.enqueue(message)
         return
+    _held.append((name, event, message))
+    if _digest_timer is None:
+        _digest_timer = asyncio.create_task(_flush_after_window())
+
+
+async def _flush_after_window() -> None:
+    await asyncio.sleep(NOTIFY_DIGEST_SECONDS)
+    await flush_digest()
+
+
+def _digest_message(held: list[tuple[str | None, str, dict]]) -> dict:
+    job_events = Counter(event for name, event, _ in held if name is not None)
+    heartbeat_events = [event for name, event, _ in held if name is None]
+
+    # "5 jobs completed, 1 failed"
+    events = sorted(job_events, key=lambda e: (e != "completed", e))
+    parts = [f"{job_events[e]} {e}" for e in events]
+    if parts:
+        count = job_events[events[0]]
+        parts[0] = f"{count} job{'s' if count > 1 else ''} {events[0]}"
+    if heartbeat_events:
+        parts.append("heartbeat failed" if "failed" in heartbeat_events else "heartbeat update")
+
+    names = list(dict.fromkeys(name for name, _, _ in held if name is not None))
+    listed = ", ".join(names[:DIGEST_MAX_NAMES])
+    if len(names) > DIGEST_MAX_NAMES:
+        listed += f", +{len(names) - DIGEST_MAX_NAMES} more"
+
+    body = ", ".join(parts)
+    if listed:
+        body += f"\n{listed}"
+    return {
+        "aps": {
+            "alert": {"title": f"Klaudimero: {len(held)} updates", "body": body},
+            "sound": "default",
+        },
+        "event": "digest",
+        "counts": dict(job_events),
+    }
 
-    key_file = apns_config.get("key_file")
-    key_id = apns_config.get("key_id")
-    team_id = apns_config.get("team_id")
-    bundle_id = apns_config.get("bundle_id")
 
-    if not all([key_file, key_id, team_id, bundle_id]):
-        logger.warning("Incomplete APNs config, skipping notification")
+async def flush_digest() -> None:
+    """Send the events held for the current digest window now."""
+    global _digest_timer
+    timer, _digest_timer = _digest_timer, None
+    if timer is not None and timer is not asyncio.current_task():
+        timer.cancel()
+    held = _held[:]
+    _held.clear()
+    if not held:
         return
+    if len(held) == 1:
+        await outbox.enqueue(held[0][2])
+    else:
+        logger.info(f"Sending {len(held)} notifications as one digest")
+        await outbox.enqueue(_digest_message(held))
 
+
+async def notify_job_event(job: Job, execution: Execution, event: str) -> None:
+    """Queue a push notification about a job event for all registered devices."""
     titles = {
         "started": f"Job Started: {job.name}",
         "completed": f"Job Completed: {job.name}",
@@ -51,65 +105,20 @@ async def notify_job_event(job: Job, execution: Execution, event: str) -> None:
     title = titles.get(event, f"Job {event}: {job.name}")
     body = bodies.get(event, "")
 
-    try:
-        with open(key_file) as f:
-            key_content = f.read()
-
-        apns = APNs(
-            key=key_content,
-            key_id=key_id,
-            team_id=team_id,
-            topic=bundle_id,
-            use_sandbox=apns_config.get("sandbox", False),
-        )
-
-        for device in devices:
-            request = NotificationRequest(
-                device_token=device.token,
-                message={
-                    "aps": {
-                        "alert": {"title": title, "body": body},
-                        "sound": "default",
-                    },
-                    "job_id": job.id,
-                    "execution_id": execution.id,
-                    "session_id": job.chat_session_id or "",
-                    "event": event,
-                },
-            )
-            response = await apns.send_notification(request)
-            if not response.is_successful:
-                logger.warning(
-                    f"Failed to send push to {device.token[:8]}...: {response.description}"
-                )
-    except Exception as e:
-        logger.error(f"APNs error: {e}")
+    await _notify(job.name, event, {
+        "aps": {
+            "alert": {"title": title, "body": body},
+            "sound": "default",
+        },
+        "job_id": job.id,
+        "execution_id": execution.id,
+        "session_id": job.chat_session_id or "",
+        "event": event,
+    })
 
 
 async def notify_heartbeat_event(execution: Execution, event: str, session_id: str = "") -> None:
-    """Send push notification for heartbeat execution."""
-    apns_config = load_apns_config()
-    if not apns_config:
-        return
-
-    devices = load_all_devices()
-    if not devices:
-        return
-
-    try:
-        from aioapns import APNs, NotificationRequest
-    except ImportError:
-        logger.warning("aioapns not installed, skipping push notifications")
-        return
-
-    key_file = apns_config.get("key_file")
-    key_id = apns_config.get("key_id")
-    team_id = apns_config.get("team_id")
-    bundle_id = apns_config.get("bundle_id")
-
-    if not all([key_file, key_id, team_id, bundle_id]):
-        return
-
+    """Queue a push notification about a heartbeat execution."""
     if event == "failed":
         title = "Heartbeat Failed"
         body = f"Exit code: {execution.exit_code}"
@@ -117,36 +126,13 @@ async def notify_heartbeat_event(execution: Execution, event: str, session_id: s
         title = "Heartbeat"
         body = execution.output.strip()[:200]
 
-    try:
-        with open(key_file) as f:
-            key_content = f.read()
-
-        apns = APNs(
-            key=key_content,
-            key_id=key_id,
-            team_id=team_id,
-            topic=bundle_id,
-            use_sandbox=apns_config.get("sandbox", False),
-        )
-
-        for device in devices:
-            request = NotificationRequest(
-                device_token=device.token,
-                message={
-                    "aps": {
-                        "alert": {"title": title, "body": body},
-                        "sound": "default",
-                    },
-                    "heartbeat": True,
-                    "execution_id": execution.id,
-                    "session_id": session_id,
-                    "event": event,
-                },
-            )
-            response = await apns.send_notification(request)
-            if not response.is_successful:
-                logger.warning(
-                    f"Failed to send push to {device.token[:8]}...: {response.description}"
-                )
-    except Exception as e:
-        logger.error(f"APNs error (heartbeat): {e}")
+    await _notify(None, event, {
+        "aps": {
+            "alert": {"title": title, "body": body},
+            "sound": "default",
+        },
+        "heartbeat": True,
+        "execution_id": execution.id,
+        "session_id": session_id,
+        "event": event,
+    })
@@ -0,0 +1,174 @@
+"""Durable delivery of push notifications.
+
+Notifications are saved to the outbox and delivered by a background
+dispatcher, so whoever raises one never waits on APNs and nothing is lost
+across restarts. Devices that could not be reached are retried with
+exponential backoff; after OUTBOX_MAX_ATTEMPTS the entry is dead-lettered
+(kept with status dead until retried or deleted through the API).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from . import apns
+from .models import OutboxEntry, OutboxStatus
+from .storage import aio
+
+logger = logging.getLogger("klaudimero.outbox")
+
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+
+_wake = asyncio.Event()
+_dispatcher: asyncio.Task | None = None
+# Serializes the read-modify-write of device stats between concurrent deliveries
+_stats_lock = asyncio.Lock()
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before the next try after attempts failed ones."""
+    return min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+async def enqueue(message: dict) -> OutboxEntry | None:
+    """Save a push for every registered device and wake the dispatcher.
+
+    Returns None (and saves nothing) when push is not configured or no
+    device is registered.
+    """
+    devices = await aio.load_all_devices()
+    if not devices:
+        logger.debug("No registered devices, skipping notification")
+        return None
+    if await apns.get_client() is None:
+        return None
+    entry = OutboxEntry(message=message, tokens=[d.token for d in devices])
+    await aio.save_outbox_entry(entry)
+    _wake.set()
+    return entry
+
+
+async def retry(entry: OutboxEntry) -> None:
+    """Put an entry (e.g. a dead one) back in line for immediate delivery."""
+    entry.status = OutboxStatus.pending
+    entry.attempts = 0
+    entry.next_attempt_at = datetime.now(timezone.utc)
+    await aio.save_outbox_entry(entry)
+    _wake.set()
+
+
+async def _record_delivery(report: apns.DeliveryReport) -> None:
+    """Update per-device delivery stats and unregister dead tokens."""
+    if report.invalid:
+        removed = await aio.delete_devices(report.invalid)
+        if removed:
+            logger.warning(f"Unregistered {removed} device(s) APNs reports as invalid")
+    now = datetime.now(timezone.utc)
+    delivered = set(report.delivered)
+    failures = {**report.retry, **report.rejected}
+    async with _stats_lock:
+        changed = []
+        for device in await aio.load_all_devices():
+            if device.token in delivered:
+                device.delivered += 1
+                device.consecutive_failures = 0
+                device.last_delivered_at = now
+            elif device.token in failures:
+                device.failed += 1
+                device.consecutive_failures += 1
+                device.last_failed_at = now
+                device.last_error = failures[device.token]
+            else:
+                continue
+            changed.append(device)
+        await aio.update_devices(changed)
+
+
+async def _attempt(entry: OutboxEntry) -> bool:
+    """Try to deliver entry. Returns whether it is still pending."""
+    try:
+        report = await apns.deliver(entry.message, entry.tokens)
+    except Exception as e:
+        failed = {token: f"{type(e).__name__}: {e}" for token in entry.tokens}
+    else:
+        failed = report.retry
+        try:
+            await _record_delivery(report)
+        except Exception:
+            logger.exception("Failed to record notification delivery")
+    entry.attempts += 1
+    if not failed:
+        await aio.delete_outbox_entry(entry.id)
+        return False
+
+    entry.tokens = list(failed)
+    entry.last_error = "; ".join(sorted(set(failed.values())))[:500]
+    if entry.attempts >= OUTBOX_MAX_ATTEMPTS:
+        entry.status = OutboxStatus.dead
+        logger.error(
+            f"Giving up on notification {entry.id} after {entry.attempts} attempts "
+            f"({len(entry.tokens)} device(s)): {entry.last_error}"
+        )
+    else:
+        delay = backoff_seconds(entry.attempts)
+        entry.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        logger.warning(
+            f"Notification {entry.id} not delivered to {len(entry.tokens)} device(s), "
+            f"retrying in {delay:.0f}s: {entry.last_error}"
+        )
+    await aio.save_outbox_entry(entry)
+    return entry.status == OutboxStatus.pending
+
+
+async def _dispatch_due() -> float | None:
+    """Attempt every pending entry that is due.
+
+    Returns the seconds until the next one is due, or None if none is pending.
+    """
+    entries = await aio.load_outbox_entries(OutboxStatus.pending)
+    now = datetime.now(timezone.utc)
+    waiting = [e for e in entries if e.next_attempt_at > now]
+    due = [e for e in entries if e.next_attempt_at <= now]
+    still_pending = await asyncio.gather(*(_attempt(e) for e in due))
+
+    pending = waiting + [e for e, retrying in zip(due, still_pending) if retrying]
+    if not pending:
+        return None
+    next_at = min(e.next_attempt_at for e in pending)
+    return max(0.0, (next_at - datetime.now(timezone.utc)).total_seconds())
+
+
+async def _run_dispatcher() -> None:
+    while True:
+        _wake.clear()
+        try:
+            delay = await _dispatch_due()
+        except Exception:
+            logger.exception("Notification dispatcher failed")
+            delay = OUTBOX_BACKOFF_BASE_SECONDS
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_dispatcher() -> None:
+    """Start delivering the outbox, including entries left from a previous run."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = asyncio.create_task(_run_dispatcher())
+
+
+async def stop_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.cancel()
+        try:
+            await _dispatcher
+        except asyncio.CancelledError:
+            pass
+        _dispatcher = None
@@ -1,48 +1,64 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import logging
 import uuid
-from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Response, UploadFile, File
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
-from ..config import UPLOADS_DIR, WORKSPACE_DIR
-from ..models import ChatSession, ChatMessage, ChatRequest
-from ..storage import (
-    save_chat_session,
-    load_chat_session,
-    load_all_chat_sessions,
-    delete_chat_session as storage_delete_chat_session,
-)
+from .. import chat_runs, execution_queue
+from ..chat_context import build_prompt, build_replay_prompt, user_text
+from ..config import CLAUDE_TIMEOUT_SECONDS, UPLOADS_DIR
+from ..execution_queue import Priority
+from ..models import ChatSession, ChatMessage, ChatRequest, ChatRun
+from ..runner import run_claude
+from ..storage import aio
+from ..streams import SSE_KEEPALIVE_SECONDS, sse_event
+
+logger = logging.getLogger("klaudimero.chat")
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.get("/sessions")
-async def list_sessions() -> list[dict]:
-    sessions = load_all_chat_sessions()
+async def list_sessions(
+    response: Response, limit: int | None = Query(None, ge=1), cursor: str | None = None
+) -> list[dict]:
+    try:
+        summaries, next_cursor = await aio.list_chat_session_summaries(
+            limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [
         {
             "id": s.id,
             "title": s.title,
             "source_type": s.source_type,
+            "source_id": s.source_id,
             "updated_at": s.updated_at.isoformat(),
+            "message_count": s.message_count,
         }
-        for s in sessions
+        for s in summaries
     ]
 
 
 @router.post("/sessions", status_code=201)
 async def create_session() -> ChatSession:
     session = ChatSession()
-    save_chat_session(session)
+    await aio.save_chat_session(session)
     return session
 
 
 @router.get("/sessions/{session_id}")
-async def get_session(session_id: str) -> ChatSession:
-    session = load_chat_session(session_id)
+async def get_session(
+    session_id: str, message_limit: int | None = Query(None, ge=0)
+) -> ChatSession:
+    session = await aio.load_chat_session(session_id, message_limit=message_limit)
     if not session:
         raise HTTPException(404, "Session not found")
     return session
@@ -50,20 +66,20 @@ async def get_session(session_id: str) -> ChatSession:
 
 @router.delete("/sessions/{session_id}", status_code=204)
 async def delete_session(session_id: str) -> None:
-    if not storage_delete_chat_session(session_id):
+    if not await aio.delete_chat_session(session_id):
         raise HTTPException(404, "Session not found")
 
 
 @router.post("/sessions/{session_id}/upload")
 async def upload_image(session_id: str, file: UploadFile = File(...)) -> dict:
-    session = load_chat_session(session_id)
+    session = await aio.load_chat_session(session_id, message_limit=0)
     if not session:
         raise HTTPException(404, "Session not found")
 
     filename = f"{uuid.uuid4()}_{file.filename}"
     file_path = UPLOADS_DIR / filename
     content = await file.read()
-    file_path.write_bytes(content)
+    await asyncio.to_thread(file_path.write_bytes, content)
 
     return {"file_path": str(file_path), "filename": file.filename}
 
@@ -76,69 +92,288 @@ async def serve_upload(filename: str) -> FileResponse:
     return FileResponse(file_path)
 
 
-@router.post("/sessions/{session_id}/message")
-async def send_message(session_id: str, data: ChatRequest) -> dict:
-    session = load_chat_session(session_id)
+async def _turn_command(
+    session: ChatSession,
+    user_message: ChatMessage,
+    max_turns: int,
+    resume: bool = True,
+) -> tuple[str, list[str], str]:
+    """Build the claude prompt and arguments for a chat turn.
+
+    When the session has a Claude CLI session, it is resumed and only what it
+    hasn't seen is sent: normally just the new message, plus any messages that
+    job or heartbeat runs appended since. Otherwise a new CLI session is
+    started with a replay of the conversation, bounded by the rolling
+    summary (see chat_context). Returns the prompt, the arguments and the CLI
+    session id they use.
+    """
+    if resume and session.claude_session_id:
+        unseen = session.messages[session.claude_session_messages:]
+        prompt = build_prompt([*unseen, user_message]) if unseen else user_text(user_message)
+        claude_session_id = session.claude_session_id
+        session_args = ["--resume", claude_session_id]
+    else:
+        prompt = await build_replay_prompt(session, user_message)
+        claude_session_id = str(uuid.uuid4())
+        session_args = ["--session-id", claude_session_id]
+
+    args = [*session_args, "--max-turns", str(max_turns), "--dangerously-skip-permissions"]
+    return prompt, args, claude_session_id
+
+
+def _claude_session_missing(output: str) -> bool:
+    # What the CLI prints when --resume names a session it no longer has
+    return "No conversation found" in output
+
+
+async def _save_turn(
+    session: ChatSession, user_message: ChatMessage, response: str, claude_session_id: str
+) -> None:
+    """Persist the exchange and the CLI session that now covers it."""
+    # Jobs and heartbeats may have appended to the thread during the turn, so
+    # the header is updated from what is stored rather than from this copy
+    claude_seen = len(session.messages)
+    session.claude_session_id = claude_session_id
+    await aio.append_chat_messages(
+        session,
+        [user_message, ChatMessage(role="assistant", content=response)],
+        fields=("title", "claude_session_id", "context_summary", "summary_through"),
+        claude_seen=claude_seen,
+    )
+
+
+async def _start_turn(session_id: str, data: ChatRequest) -> tuple[ChatSession, ChatMessage]:
+    """Load the session and create the user message for a new turn."""
+    session = await aio.load_chat_session(session_id)
     if not session:
         raise HTTPException(404, "Session not found")
+    if chat_runs.active_run(session.id):
+        raise HTTPException(409, "A message is already being answered in this session")
 
-    # Append user message
-    session.messages.append(ChatMessage(role="user", content=data.content, images=data.images))
+    user_message = ChatMessage(role="user", content=data.content, images=data.images)
 
     # Auto-set title from first user message
     if not session.title:
         session.title = data.content[:50].strip()
 
-    # Build prompt from conversation history
-    prompt_parts = []
-    for msg in session.messages:
-        if msg.role == "user":
-            text = msg.content
-            for img_path in msg.images:
-                text += f"\n[Attached image: {img_path} — read this file to see the image]"
-            prompt_parts.append(f"User: {text}")
-        else:
-            prompt_parts.append(f"Assistant: {msg.content}")
-    prompt_parts.append("Assistant:")
-    full_prompt = "\n\n".join(prompt_parts)
-
-    # Run claude
-    cmd = [
-        "claude",
-        "-p",
-        full_prompt,
-        "--output-format", "text",
-        "--max-turns", str(data.max_turns),
-        "--dangerously-skip-permissions",
-    ]
+    return session, user_message
 
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            cwd=str(WORKSPACE_DIR),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.STDOUT,
+
+async def _run_claude_text(session: ChatSession, prompt: str, args: list[str]) -> tuple[int, str]:
+    # The reply is the chat message itself, so it is never capped
+    result = await run_claude(prompt, args, label=f"chat {session.id}", max_output_bytes=None)
+    if result.timed_out:
+        raise HTTPException(504, f"Claude timed out after {CLAUDE_TIMEOUT_SECONDS}s")
+    return result.returncode, result.output
+
+
+async def _run_turn(session: ChatSession, user_message: ChatMessage, max_turns: int) -> str:
+    """Run claude for one chat turn and persist the exchange. Returns the answer."""
+    async with execution_queue.slot(Priority.chat, session.title or "Chat", session.id):
+        try:
+            prompt, args, claude_session_id = await _turn_command(
+                session, user_message, max_turns
+            )
+            returncode, output = await _run_claude_text(session, prompt, args)
+            if returncode != 0 and "--resume" in args and _claude_session_missing(output):
+                logger.info(f"Claude session for chat {session.id} is gone, replaying")
+                prompt, args, claude_session_id = await _turn_command(
+                    session, user_message, max_turns, resume=False
+                )
+                returncode, output = await _run_claude_text(session, prompt, args)
+
+            if returncode != 0:
+                raise HTTPException(502, f"Claude exited with code {returncode}: {output[:500]}")
+
+            response = output.strip()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(502, f"Error running Claude: {e}")
+
+        await _save_turn(session, user_message, response, claude_session_id)
+        return response
+
+
+@router.post("/sessions/{session_id}/message")
+async def send_message(session_id: str, data: ChatRequest, detach: bool = False) -> dict:
+    """Answer a message.
+
+    The turn runs as a background chat run, so it completes and is saved even
+    if the client disconnects. With detach=true the response is 202 with the
+    run, to be polled at /chat/runs/{run_id}.
+    """
+    session, user_message = await _start_turn(session_id, data)
+    run = chat_runs.start_run(session.id, _run_turn(session, user_message, data.max_turns))
+    if detach:
+        return JSONResponse(
+            run.model_dump(mode="json"),
+            status_code=202,
+            headers={"Location": f"/chat/runs/{run.id}"},
         )
+    return {"response": await chat_runs.wait_for_run(run)}
+
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str) -> ChatRun:
+    run = chat_runs.get_run(run_id)
+    if not run:
+        raise HTTPException(404, "Run not found")
+    return run
+
+
+@router.get("/sessions/{session_id}/runs")
+async def list_session_runs(session_id: str) -> list[ChatRun]:
+    return chat_runs.list_runs(session_id)
+
+
+# --- Streaming ---
+#
+# The streaming variant runs claude with stream-json output and forwards text
+# deltas as Server-Sent Events. The claude run is a chat run feeding a queue,
+# so the answer is still persisted if the client disconnects mid-stream.
+
+
+def _text_delta(event: dict) -> str | None:
+    """Extract the text of a stream-json partial message delta, if any."""
+    if event.get("type") != "stream_event":
+        return None
+    inner = event.get("event") or {}
+    delta = inner.get("delta") or {}
+    if inner.get("type") == "content_block_delta" and delta.get("type") == "text_delta":
+        return delta.get("text") or None
+    return None
+
+
+async def _run_claude_stream(
+    session: ChatSession,
+    prompt: str,
+    args: list[str],
+    queue: asyncio.Queue,
+    streamed: list[str],
+) -> tuple[int, dict | None, str]:
+    """Run claude with stream-json output, pushing text deltas onto queue.
+
+    Returns the exit code, the final "result" event and any non-JSON output.
+    """
+    result: dict | None = None
+    diagnostics: list[str] = []
+
+    async def on_line(raw: bytes) -> None:
+        nonlocal result
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line:
+            return
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            diagnostics.append(line)
+            return
+        text = _text_delta(event)
+        if text:
+            streamed.append(text)
+            queue.put_nowait(sse_event("delta", {"text": text}))
+        elif event.get("type") == "result":
+            result = event
+
+    run = await run_claude(
+        prompt,
+        ["--include-partial-messages", *args],
+        label=f"chat {session.id}",
+        output_format="stream-json",
+        on_output=on_line,
+    )
+    if run.timed_out:
+        raise HTTPException(504, f"Claude timed out after {CLAUDE_TIMEOUT_SECONDS}s")
+    return run.returncode, result, "\n".join(diagnostics)
+
+
+async def _run_streaming_turn(
+    session: ChatSession,
+    user_message: ChatMessage,
+    max_turns: int,
+    queue: asyncio.Queue,
+) -> str:
+    """Run a chat turn with stream-json output, pushing SSE messages onto queue.
+
+    Sends "delta" events while claude writes, then persists the exchange and
+    sends "done" with the full response, or "error" if the run failed. A
+    None on the queue marks the end of the stream. Returns the answer.
+    """
+    async with execution_queue.slot(Priority.chat, session.title or "Chat", session.id):
+        streamed: list[str] = []
         try:
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=3600)
+            prompt, args, claude_session_id = await _turn_command(
+                session, user_message, max_turns
+            )
+            returncode, result, diagnostics = await _run_claude_stream(
+                session, prompt, args, queue, streamed
+            )
+            if (
+                returncode != 0
+                and not streamed
+                and "--resume" in args
+                and _claude_session_missing(diagnostics)
+            ):
+                logger.info(f"Claude session for chat {session.id} is gone, replaying")
+                prompt, args, claude_session_id = await _turn_command(
+                    session, user_message, max_turns, resume=False
+                )
+                returncode, result, diagnostics = await _run_claude_stream(
+                    session, prompt, args, queue, streamed
+                )
+
+            if returncode != 0 or (result and result.get("is_error")):
+                output = (result or {}).get("result") or diagnostics
+                raise HTTPException(502, f"Claude exited with code {returncode}: {output[:500]}")
+
+            response = ((result or {}).get("result") or "".join(streamed)).strip()
+            if not streamed and response:
+                # No partial messages (older CLI): deliver the answer in one delta
+                queue.put_nowait(sse_event("delta", {"text": response}))
+
+            await _save_turn(session, user_message, response, claude_session_id)
+            queue.put_nowait(sse_event("done", {"response": response}))
+            return response
+        except HTTPException as e:
+            queue.put_nowait(sse_event("error", {"detail": e.detail}))
+            raise
+        except Exception as e:
+            logger.exception(f"Streaming chat turn for session {session.id} failed")
+            queue.put_nowait(sse_event("error", {"detail": f"Error running Claude: {e}"}))
+            raise HTTPException(502, f"Error running Claude: {e}")
+        finally:
+            queue.put_nowait(None)
+
+
+async def _forward_events(queue: asyncio.Queue):
+    while True:
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            raise HTTPException(504, "Claude timed out after 1 hour")
-
-        if proc.returncode != 0:
-            output = stdout.decode("utf-8", errors="replace") if stdout else ""
-            raise HTTPException(502, f"Claude exited with code {proc.returncode}: {output[:500]}")
-
-        response = stdout.decode("utf-8", errors="replace").strip() if stdout else ""
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(502, f"Error running Claude: {e}")
-
-    # Append assistant response and save
-    session.messages.append(ChatMessage(role="assistant", content=response))
-    session.updated_at = datetime.now(timezone.utc)
-    save_chat_session(session)
-
-    return {"response": response}
+            yield ": keepalive\n\n"
+            continue
+        if item is None:
+            return
+        yield item
+
+
+@router.post("/sessions/{session_id}/message/stream")
+async def send_message_stream(session_id: str, data: ChatRequest) -> StreamingResponse:
+    """Like send_message, but streams the answer as Server-Sent Events.
+
+    The run id is returned in X-Run-Id, so a client that loses the stream can
+    fetch the result from /chat/runs/{run_id}.
+    """
+    session, user_message = await _start_turn(session_id, data)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    run = chat_runs.start_run(
+        session.id, _run_streaming_turn(session, user_message, data.max_turns, queue)
+    )
+
+    return StreamingResponse(
+        _forward_events(queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Run-Id": run.id},
+    )
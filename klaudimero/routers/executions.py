@@ -1,29 +1,255 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+import asyncio
+import codecs
+import gzip
+import time
+from datetime import datetime, timezone
 
-from ..models import Execution
-from ..storage import load_execution, load_executions_for_job, load_latest_execution
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from ..models import Execution, ExecutionStatus
+from ..storage import aio
+from ..streams import SSE_KEEPALIVE_SECONDS, get_stream, sse_event
 
 router = APIRouter(tags=["executions"])
 
+# Largest page of executions a listing returns
+MAX_PAGE_SIZE = 500
+
+# Live output is read back from its file in pieces of this size
+LIVE_READ_CHUNK_BYTES = 64 * 1024
+
+# How often a stream request checks whether a queued execution has started
+STREAM_POLL_SECONDS = 1
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # Naive timestamps in query strings are taken to be UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def execution_page(
+    response: Response,
+    job_id: str | None,
+    limit: int,
+    cursor: str | None,
+    status: ExecutionStatus | None,
+    since: datetime | None,
+    until: datetime | None,
+    full_output: bool,
+) -> list[Execution]:
+    """Fetch one page of executions, putting the next cursor in X-Next-Cursor."""
+    try:
+        executions, next_cursor = await aio.list_executions(
+            job_id,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            since=_as_utc(since),
+            until=_as_utc(until),
+            full_output=full_output,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return executions
+
+
+@router.get("/executions")
+async def list_all_executions(
+    response: Response,
+    job_id: str | None = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: ExecutionStatus | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    full_output: bool = False,
+) -> list[Execution]:
+    return await execution_page(
+        response, job_id, limit, cursor, status, since, until, full_output
+    )
+
 
 @router.get("/jobs/{job_id}/executions")
-async def list_executions(job_id: str, limit: int = 50) -> list[Execution]:
-    return load_executions_for_job(job_id, limit=limit)
+async def list_executions_for_job(
+    job_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: ExecutionStatus | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    full_output: bool = False,
+) -> list[Execution]:
+    return await execution_page(
+        response, job_id, limit, cursor, status, since, until, full_output
+    )
+
+
+@router.get("/jobs/{job_id}/executions/latest")
+async def get_latest_job_execution(job_id: str, full_output: bool = False) -> Execution:
+    ex = await aio.load_latest_execution(job_id, full_output=full_output)
+    if not ex:
+        raise HTTPException(404, "No executions found")
+    return ex
 
 
 @router.get("/executions/latest")
-async def get_latest_execution() -> Execution:
-    ex = load_latest_execution()
+async def get_latest_execution(full_output: bool = False) -> Execution:
+    ex = await aio.load_latest_execution(full_output=full_output)
     if not ex:
         raise HTTPException(404, "No executions found")
     return ex
 
 
 @router.get("/executions/{execution_id}")
-async def get_execution(execution_id: str) -> Execution:
-    ex = load_execution(execution_id)
+async def get_execution(execution_id: str, full_output: bool = True) -> Execution:
+    ex = await aio.load_execution(execution_id, full_output=full_output)
     if not ex:
         raise HTTPException(404, "Execution not found")
     return ex
+
+
+async def _wait_for_stream(execution_id: str):
+    """Yield keepalives while the execution is queued (or about to start
+    claude), until its live stream exists or it is no longer active."""
+    last_keepalive = time.monotonic()
+    while get_stream(execution_id) is None:
+        ex = await aio.load_execution(execution_id)
+        if ex is None or ex.status not in (ExecutionStatus.queued, ExecutionStatus.running):
+            return
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+        if time.monotonic() - last_keepalive >= SSE_KEEPALIVE_SECONDS:
+            last_keepalive = time.monotonic()
+            yield ": keepalive\n\n"
+
+
+async def _stream_execution_output(execution_id: str):
+    """Replay the stored output, then follow live output until the execution ends.
+
+    A queued execution is followed once it starts. The live output file is
+    read in chunks from the last position sent, both at first and whenever
+    the subscriber fell behind. Emits "output" events ({"text": ...}) and a
+    final "end" event carrying the execution's status.
+    """
+    async for keepalive in _wait_for_stream(execution_id):
+        yield keepalive
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    stream = get_stream(execution_id)
+    subscription = stream.subscribe() if stream else None
+    try:
+        if subscription is None:
+            # Not running (or finished meanwhile): send the final output
+            ex = await aio.load_execution(execution_id, full_output=True)
+            if ex.output:
+                yield sse_event("output", {"text": ex.output})
+            yield sse_event("end", {"status": ex.status.value})
+            return
+
+        queue = subscription.queue
+        position = 0
+        while True:
+            if queue.empty():
+                if subscription.lagging:
+                    # Chunks from here on are queued; earlier ones are in the file
+                    subscription.lagging = False
+                    while True:
+                        # No live file yet just means claude hasn't written anything
+                        data = await aio.read_live_output(
+                            execution_id, LIVE_READ_CHUNK_BYTES, position
+                        )
+                        if not data:
+                            break
+                        position += len(data)
+                        text = decoder.decode(data)
+                        if text:
+                            yield sse_event("output", {"text": text})
+                    continue
+                if stream.closed:
+                    break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                break
+            offset, data = item
+            end = offset + len(data)
+            if end <= position:
+                continue  # already read from the live file
+            data = data[max(0, position - offset):]
+            position = end
+            text = decoder.decode(data)
+            if text:
+                yield sse_event("output", {"text": text})
+
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield sse_event("output", {"text": tail})
+        ex = await aio.load_execution(execution_id, full_output=not position)
+        if not position and ex and ex.output:
+            # Finished before anything was followed live
+            yield sse_event("output", {"text": ex.output})
+        yield sse_event("end", {"status": ex.status.value if ex else "unknown"})
+    finally:
+        if stream and subscription:
+            stream.unsubscribe(subscription)
+
+
+@router.get("/executions/{execution_id}/stream")
+async def stream_execution(execution_id: str) -> StreamingResponse:
+    """Server-Sent Events feed of an execution's output, live while it runs."""
+    if not await aio.load_execution(execution_id):
+        raise HTTPException(404, "Execution not found")
+    return StreamingResponse(
+        _stream_execution_output(execution_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/executions/{execution_id}/cancel")
+async def cancel_execution(execution_id: str) -> dict:
+    """Stop a queued or running execution, including Claude's subprocesses."""
+    from ..executor import cancel_execution as cancel
+
+    execution = await aio.load_execution(execution_id)
+    if not execution:
+        raise HTTPException(404, "Execution not found")
+    if execution.status not in (ExecutionStatus.queued, ExecutionStatus.running):
+        raise HTTPException(409, f"Execution is already {execution.status.value}")
+
+    if not await cancel(execution_id):
+        # Left over from before a restart: nothing is running it any more
+        execution.status = ExecutionStatus.cancelled
+        execution.finished_at = datetime.now(timezone.utc)
+        await aio.save_execution(execution)
+    return {"status": "cancelled", "execution_id": execution_id}
+
+
+@router.get("/executions/{execution_id}/output")
+async def get_execution_output(execution_id: str, request: Request) -> Response:
+    """Full output as plain text, sent still gzipped when the client accepts it."""
+    ex = await aio.load_execution(execution_id)
+    if not ex:
+        raise HTTPException(404, "Execution not found")
+    media_type = "text/plain; charset=utf-8"
+    if not ex.output_is_preview:
+        return Response(ex.output, media_type=media_type)
+
+    compressed = await aio.read_compressed_output(execution_id)
+    if compressed is None:
+        raise HTTPException(404, "Execution output not found")
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(compressed, media_type=media_type, headers={"Content-Encoding": "gzip"})
+    return Response(
+        await asyncio.to_thread(gzip.decompress, compressed), media_type=media_type
+    )
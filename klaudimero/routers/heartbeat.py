@@ -1,18 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+from datetime import datetime
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 
 from ..config import HEARTBEAT_JOB_ID
-from ..models import HeartbeatConfigUpdate, HeartbeatStatus, Execution
-from ..storage import (
-    load_heartbeat_config,
-    save_heartbeat_config,
-    load_heartbeat_prompt,
-    save_heartbeat_prompt,
-    load_executions_for_job,
-)
+from ..models import HeartbeatConfigUpdate, HeartbeatStatus, Execution, ExecutionStatus
+from ..storage import aio
+from .executions import MAX_PAGE_SIZE, execution_page
 
 router = APIRouter(prefix="/heartbeat", tags=["heartbeat"])
 
@@ -21,12 +17,13 @@ ALLOWED_INTERVALS = {10, 30, 60}
 
 @router.get("")
 async def get_heartbeat() -> HeartbeatStatus:
-    config = load_heartbeat_config()
-    prompt = load_heartbeat_prompt()
+    config = await aio.load_heartbeat_config()
+    prompt = await aio.load_heartbeat_prompt()
     return HeartbeatStatus(
         enabled=config.enabled,
         interval_minutes=config.interval_minutes,
         max_turns=config.max_turns,
+        quiet_hours=config.quiet_hours,
         prompt=prompt,
     )
 
@@ -35,7 +32,7 @@ async def get_heartbeat() -> HeartbeatStatus:
 async def update_heartbeat(data: HeartbeatConfigUpdate) -> HeartbeatStatus:
     from ..heartbeat import schedule_heartbeat, unschedule_heartbeat
 
-    config = load_heartbeat_config()
+    config = await aio.load_heartbeat_config()
 
     if data.interval_minutes is not None and data.interval_minutes not in ALLOWED_INTERVALS:
         raise HTTPException(400, f"interval_minutes must be one of {sorted(ALLOWED_INTERVALS)}")
@@ -46,34 +43,48 @@ async def update_heartbeat(data: HeartbeatConfigUpdate) -> HeartbeatStatus:
         config.interval_minutes = data.interval_minutes
     if data.max_turns is not None:
         config.max_turns = data.max_turns
+    if data.quiet_hours is not None:
+        config.quiet_hours = data.quiet_hours
 
-    save_heartbeat_config(config)
+    await aio.save_heartbeat_config(config)
 
     if data.prompt is not None:
-        save_heartbeat_prompt(data.prompt)
+        await aio.save_heartbeat_prompt(data.prompt)
 
     # Reschedule
     unschedule_heartbeat()
     if config.enabled:
         schedule_heartbeat(config)
 
-    prompt = load_heartbeat_prompt()
+    prompt = await aio.load_heartbeat_prompt()
     return HeartbeatStatus(
         enabled=config.enabled,
         interval_minutes=config.interval_minutes,
         max_turns=config.max_turns,
+        quiet_hours=config.quiet_hours,
         prompt=prompt,
     )
 
 
 @router.get("/executions")
-async def list_heartbeat_executions(limit: int = 50) -> list[Execution]:
-    return load_executions_for_job(HEARTBEAT_JOB_ID, limit=limit)
+async def list_heartbeat_executions(
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: ExecutionStatus | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    full_output: bool = False,
+) -> list[Execution]:
+    return await execution_page(
+        response, HEARTBEAT_JOB_ID, limit, cursor, status, since, until, full_output
+    )
 
 
 @router.post("/trigger")
 async def trigger_heartbeat() -> dict:
+    from ..execution_queue import Priority
     from ..heartbeat import run_heartbeat
 
-    asyncio.get_event_loop().create_task(run_heartbeat())
+    asyncio.get_event_loop().create_task(run_heartbeat(Priority.manual))
     return {"status": "triggered"}
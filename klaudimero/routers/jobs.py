@@ -6,7 +6,7 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException
 
 from ..models import Job, JobCreate, JobUpdate
-from ..storage import save_job, load_job, load_all_jobs, delete_job as storage_delete_job
+from ..storage import aio
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/jobs", tags=["jobs"])
 async def list_jobs() -> list[dict]:
     from ..scheduler import get_scheduler
 
-    jobs = load_all_jobs()
+    jobs = await aio.load_all_jobs()
     scheduler = get_scheduler()
     result = []
     for job in jobs:
@@ -40,7 +40,7 @@ async def create_job(data: JobCreate) -> Job:
         raise HTTPException(400, str(e))
 
     job = Job(**data.model_dump())
-    save_job(job)
+    await aio.save_job(job)
     if job.enabled:
         add_scheduled_job(job)
     return job
@@ -50,7 +50,7 @@ async def create_job(data: JobCreate) -> Job:
 async def get_job(job_id: str) -> dict:
     from ..scheduler import get_scheduler
 
-    job = load_job(job_id)
+    job = await aio.load_job(job_id)
     if not job:
         raise HTTPException(404, "Job not found")
     data = job.model_dump(mode="json")
@@ -67,15 +67,16 @@ async def get_job(job_id: str) -> dict:
 async def update_job(job_id: str, data: JobUpdate) -> Job:
     from ..scheduler import add_scheduled_job, remove_scheduled_job
 
-    job = load_job(job_id)
+    job = await aio.load_job(job_id)
     if not job:
         raise HTTPException(404, "Job not found")
 
-    updates = data.model_dump(exclude_unset=True)
+    # Attribute values rather than model_dump, so nested models (quiet_hours) stay models
+    updates = {key: getattr(data, key) for key in data.model_fields_set}
     for key, value in updates.items():
         setattr(job, key, value)
     job.updated_at = datetime.now(timezone.utc)
-    save_job(job)
+    await aio.save_job(job)
 
     # Validate schedule if changed
     if "schedule" in updates:
@@ -97,18 +98,19 @@ async def update_job(job_id: str, data: JobUpdate) -> Job:
 async def delete_job(job_id: str) -> None:
     from ..scheduler import remove_scheduled_job
 
-    if not storage_delete_job(job_id):
+    if not await aio.delete_job(job_id):
         raise HTTPException(404, "Job not found")
     remove_scheduled_job(job_id)
 
 
 @router.post("/{job_id}/trigger")
 async def trigger_job(job_id: str) -> dict:
+    from ..execution_queue import Priority
     from ..executor import run_job
 
-    job = load_job(job_id)
+    job = await aio.load_job(job_id)
     if not job:
         raise HTTPException(404, "Job not found")
 
-    asyncio.get_event_loop().create_task(run_job(job))
+    asyncio.get_event_loop().create_task(run_job(job, Priority.manual))
     return {"status": "triggered", "job_id": job_id}
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from .. import outbox
+from ..models import OutboxEntry, OutboxStatus
+from ..storage import aio
+
+router = APIRouter(prefix="/notifications", tags=["notifications"])
+
+
+@router.get("/outbox")
+async def list_outbox(status: Optional[OutboxStatus] = None) -> list[OutboxEntry]:
+    """Notifications not delivered yet, soonest next attempt first."""
+    return await aio.load_outbox_entries(status)
+
+
+@router.post("/outbox/{entry_id}/retry")
+async def retry_outbox_entry(entry_id: str) -> OutboxEntry:
+    """Deliver a pending or dead notification again now."""
+    entry = await aio.load_outbox_entry(entry_id)
+    if not entry:
+        raise HTTPException(404, "Notification not found")
+    await outbox.retry(entry)
+    return entry
+
+
+@router.delete("/outbox/{entry_id}", status_code=204)
+async def delete_outbox_entry(entry_id: str) -> None:
+    if not await aio.delete_outbox_entry(entry_id):
+        raise HTTPException(404, "Notification not found")
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from ..execution_queue import queue_status
+from ..models import QueueStatus
+
+router = APIRouter(prefix="/queue", tags=["queue"])
+
+
+@router.get("")
+async def get_queue() -> QueueStatus:
+    """Executions holding a slot, and those waiting for one in start order."""
+    return queue_status()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 from fastapi import APIRouter
 from pydantic import BaseModel
 
@@ -8,17 +10,21 @@ from ..config import WORKSPACE_CLAUDE_MD
 router = APIRouter(prefix="/soul", tags=["soul"])
 
 
+def _read_soul() -> str:
+    return WORKSPACE_CLAUDE_MD.read_text() if WORKSPACE_CLAUDE_MD.exists() else ""
+
+
 class SoulUpdate(BaseModel):
     content: str
 
 
 @router.get("")
 async def get_soul() -> dict:
-    content = WORKSPACE_CLAUDE_MD.read_text() if WORKSPACE_CLAUDE_MD.exists() else ""
+    content = await asyncio.to_thread(_read_soul)
     return {"content": content}
 
 
 @router.put("")
 async def update_soul(data: SoulUpdate) -> dict:
-    WORKSPACE_CLAUDE_MD.write_text(data.content)
+    await asyncio.to_thread(WORKSPACE_CLAUDE_MD.write_text, data.content)
     return {"content": data.content}
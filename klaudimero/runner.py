@@ -0,0 +1,361 @@
+"""Running the claude CLI.
+
+Every claude process (job runs, heartbeats, chat turns, context summaries)
+goes through run_claude, which handles prompt transport, output formats,
+timeouts, cancellation and output caps, and reports timing to run hooks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel
+
+from .config import CLAUDE_TIMEOUT_SECONDS, OUTPUT_CAP_KB, WORKSPACE_DIR
+
+logger = logging.getLogger("klaudimero.runner")
+
+# Prompts up to this size go on the command line; larger ones are written to
+# the process's stdin. Linux caps a single argument at 128 KiB (E2BIG), and
+# argv is visible to every user in ps.
+PROMPT_ARGV_MAX_BYTES = 16 * 1024
+
+# How long claude gets to exit after SIGTERM before its group is SIGKILLed
+KILL_GRACE_SECONDS = 5
+
+_stdin_writers: set[asyncio.Task] = set()
+
+
+def claude_command(prompt: str, args: list[str]) -> tuple[list[str], bytes | None]:
+    """Build a `claude -p` command for prompt.
+
+    Returns the command and, for prompts too large for argv, the bytes to
+    send on stdin (None when the prompt is in the command).
+    """
+    data = prompt.encode("utf-8")
+    if len(data) <= PROMPT_ARGV_MAX_BYTES:
+        return ["claude", "-p", prompt, *args], None
+    return ["claude", "-p", *args], data
+
+
+async def _write_stdin(proc: asyncio.subprocess.Process, data: bytes) -> None:
+    try:
+        proc.stdin.write(data)
+        await proc.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        logger.warning(f"claude (pid {proc.pid}) exited before reading its prompt")
+    finally:
+        proc.stdin.close()
+
+
+async def spawn_claude(
+    prompt: str,
+    args: list[str],
+    cwd: Path = WORKSPACE_DIR,
+    **kwargs,
+) -> asyncio.subprocess.Process:
+    """Start claude on prompt with stdout and stderr combined into proc.stdout.
+
+    The prompt is passed in argv or streamed over stdin depending on its size
+    (see claude_command). Extra keyword arguments go to
+    create_subprocess_exec.
+    """
+    cmd, stdin_data = claude_command(prompt, args)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=str(cwd),
+        stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        # Own process group, so the CLI's tool subprocesses can be killed too
+        start_new_session=True,
+        **kwargs,
+    )
+    if stdin_data is not None:
+        # Written concurrently so a large prompt can't deadlock against output
+        task = asyncio.create_task(_write_stdin(proc, stdin_data))
+        _stdin_writers.add(task)
+        task.add_done_callback(_stdin_writers.discard)
+    return proc
+
+
+# --- Runs ---
+
+READ_CHUNK_BYTES = 64 * 1024
+
+# stream-json emits one JSON document per line; tool results can make a
+# single line large
+STREAM_LINE_LIMIT = 16 * 1024 * 1024
+
+
+class _HeadTail:
+    """Keeps the first and last limit // 2 bytes of a stream."""
+
+    def __init__(self, limit: int | None) -> None:
+        self.head_limit = None if limit is None else limit - limit // 2
+        self.tail_limit = None if limit is None else limit // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def add(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        if self.head_limit is None:
+            self.head.extend(chunk)
+            return
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head.extend(chunk[:room])
+            chunk = chunk[room:]
+        if not chunk or not self.tail_limit:
+            return
+        self.tail.extend(chunk[-self.tail_limit:])
+        if len(self.tail) > self.tail_limit:
+            del self.tail[: len(self.tail) - self.tail_limit]
+
+    def text(self) -> str:
+        if not self.truncated:
+            # Decoded together so a character split across head and tail survives
+            return bytes(self.head + self.tail).decode("utf-8", errors="replace")
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        omitted = self.total - len(self.head) - len(self.tail)
+        return f"{head}\n[... {omitted} bytes omitted ...]\n{tail}"
+
+
+class RunStats(BaseModel):
+    label: str
+    output_format: str
+    spawn_seconds: Optional[float] = None  # until the process was started
+    first_byte_seconds: Optional[float] = None  # from start to first output
+    duration_seconds: float = 0.0  # from start to exit
+    bytes_out: int = 0
+    exit_code: Optional[int] = None
+    timed_out: bool = False
+    cancelled: bool = False
+    truncated: bool = False
+
+
+class RunResult(BaseModel):
+    output: str  # decoded; head and tail only if the output went over max_output_bytes
+    returncode: int
+    stats: RunStats
+
+    @property
+    def timed_out(self) -> bool:
+        return self.stats.timed_out
+
+    @property
+    def cancelled(self) -> bool:
+        return self.stats.cancelled
+
+
+PreRunHook = Callable[[str, list[str]], None]
+PostRunHook = Callable[[RunStats], None]
+
+_pre_run_hooks: list[PreRunHook] = []
+_post_run_hooks: list[PostRunHook] = []
+
+
+def add_run_hooks(pre: PreRunHook | None = None, post: PostRunHook | None = None) -> None:
+    """Register callbacks run before each spawn (label, args) and after each
+    run (its RunStats). Exceptions in hooks are logged and ignored."""
+    if pre:
+        _pre_run_hooks.append(pre)
+    if post:
+        _post_run_hooks.append(post)
+
+
+def _call_hooks(hooks: list, *args) -> None:
+    for hook in hooks:
+        try:
+            hook(*args)
+        except Exception:
+            logger.exception(f"Run hook {hook!r} failed")
+
+
+def _log_run(stats: RunStats) -> None:
+    first_byte = f"{stats.first_byte_seconds:.2f}s" if stats.first_byte_seconds is not None else "-"
+    logger.info(
+        f"claude {stats.label}: exit={stats.exit_code} spawn={stats.spawn_seconds or 0:.3f}s "
+        f"first_byte={first_byte} total={stats.duration_seconds:.2f}s "
+        f"bytes_out={stats.bytes_out}"
+        + (" timed_out" if stats.timed_out else "")
+        + (" cancelled" if stats.cancelled else "")
+        + (" truncated" if stats.truncated else "")
+    )
+
+
+add_run_hooks(post=_log_run)
+
+
+def output_format_args(output_format: str) -> list[str]:
+    args = ["--output-format", output_format]
+    if output_format == "stream-json":
+        # The CLI requires --verbose for stream-json in print mode
+        args.append("--verbose")
+    return args
+
+
+async def run_claude(
+    prompt: str,
+    args: list[str],
+    *,
+    label: str = "run",
+    output_format: str = "text",
+    timeout: float | None = CLAUDE_TIMEOUT_SECONDS,
+    max_output_bytes: int | None = OUTPUT_CAP_KB * 1024,
+    on_output: Callable[[bytes], Awaitable[None]] | None = None,
+    run_id: str | None = None,
+) -> RunResult:
+    """Run claude on prompt and collect its output.
+
+    args are extra CLI arguments (the output format flags are added from
+    output_format). stdout and stderr are read together; for stream-json they
+    are read line by line, otherwise in chunks, and each piece is passed to
+    on_output as it arrives. Only the first and last max_output_bytes / 2
+    are kept for the result, so memory use does not grow with the output;
+    callers that need all of it must keep it from on_output. On timeout the
+    process group is terminated and the result is marked timed_out with
+    returncode -1. With a run_id registered through cancellable(),
+    cancel_run stops the process and the result is marked cancelled. If the
+    calling task is cancelled, the process group is terminated before the
+    cancellation propagates; the same happens for any other exception raised
+    while reading.
+    """
+    stats = RunStats(label=label, output_format=output_format)
+    full_args = [*output_format_args(output_format), *args]
+    line_mode = output_format == "stream-json"
+    _call_hooks(_pre_run_hooks, label, full_args)
+
+    kept = _HeadTail(max_output_bytes)
+    began = time.monotonic()
+    proc = await spawn_claude(
+        prompt, full_args, **({"limit": STREAM_LINE_LIMIT} if line_mode else {})
+    )
+    started = time.monotonic()
+    stats.spawn_seconds = round(started - began, 4)
+    active = _active_runs.get(run_id) if run_id else None
+    if active is not None:
+        active.proc = proc
+
+    async def read_all() -> None:
+        while True:
+            if line_mode:
+                chunk = await proc.stdout.readline()
+            else:
+                chunk = await proc.stdout.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            if stats.first_byte_seconds is None:
+                stats.first_byte_seconds = round(time.monotonic() - started, 4)
+            stats.bytes_out += len(chunk)
+            kept.add(chunk)
+            if on_output is not None:
+                await on_output(chunk)
+        await proc.wait()
+
+    try:
+        await asyncio.wait_for(read_all(), timeout=timeout)
+    except asyncio.TimeoutError:
+        stats.timed_out = True
+        await terminate(proc)
+    except asyncio.CancelledError:
+        stats.cancelled = True
+        await asyncio.shield(terminate(proc))
+        raise
+    except BaseException:
+        # e.g. a line over STREAM_LINE_LIMIT or a failing on_output: don't
+        # leave the process group running without an owner
+        if proc.returncode is None:
+            await asyncio.shield(terminate(proc))
+        raise
+    finally:
+        if active is not None and active.cancelled:
+            stats.cancelled = True
+        stats.duration_seconds = round(time.monotonic() - started, 4)
+        stats.exit_code = proc.returncode
+        stats.truncated = kept.truncated
+        _call_hooks(_post_run_hooks, stats)
+
+    return RunResult(
+        output=kept.text(),
+        returncode=-1 if stats.timed_out else proc.returncode,
+        stats=stats,
+    )
+
+
+def _signal_group(proc: asyncio.subprocess.Process, sig: signal.Signals) -> None:
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass  # the whole group is gone already
+
+
+async def terminate(proc: asyncio.subprocess.Process) -> None:
+    """Stop claude and everything it started.
+
+    Sends SIGTERM to the process group, then SIGKILL once the CLI has exited
+    or KILL_GRACE_SECONDS have passed, to take out tool subprocesses that
+    ignored or outlived the SIGTERM.
+    """
+    _signal_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"claude (pid {proc.pid}) ignored SIGTERM, killing its process group")
+    _signal_group(proc, signal.SIGKILL)
+    await proc.wait()
+
+
+# --- Cancellation ---
+
+class _ActiveRun:
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.proc: asyncio.subprocess.Process | None = None
+        self.cancelled = False
+
+
+_active_runs: dict[str, _ActiveRun] = {}
+
+
+@asynccontextmanager
+async def cancellable(run_id: str):
+    """Make the current task cancellable by run_id through cancel_run."""
+    _active_runs[run_id] = _ActiveRun(asyncio.current_task())
+    try:
+        yield
+    finally:
+        _active_runs.pop(run_id, None)
+
+
+async def cancel_run(run_id: str) -> bool:
+    """Cancel a run registered with cancellable().
+
+    Once claude has been started, its process group is terminated and
+    run_claude returns a cancelled result. Before that (e.g. while waiting
+    for an execution slot) the task itself is cancelled. Returns False if
+    no such run is active.
+    """
+    active = _active_runs.get(run_id)
+    if active is None:
+        return False
+    active.cancelled = True
+    if active.proc is not None:
+        if active.proc.returncode is None:
+            await terminate(active.proc)
+    else:
+        active.task.cancel()
+    return True
@@ -3,14 +3,16 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
+from datetime import datetime
 
 import zoneinfo
 
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
-from .models import Job
+from .models import Job, QuietHours
 from .storage import load_all_jobs
 
 logger = logging.getLogger("klaudimero.scheduler")
@@ -19,14 +21,46 @@ _scheduler: AsyncIOScheduler | None = None
 
 USER_TZ = zoneinfo.ZoneInfo("Europe/Berlin")
 
+# Scheduled runs that may wait for a job with coalesce off before APScheduler
+# starts dropping them (recorded as skipped via _on_run_not_started)
+MAX_WAITING_SCHEDULED_RUNS = 5
+
+_pending_records: set[asyncio.Task] = set()
+
 
 def get_scheduler() -> AsyncIOScheduler:
     global _scheduler
     if _scheduler is None:
         _scheduler = AsyncIOScheduler(timezone=USER_TZ)
+        _scheduler.add_listener(_on_run_not_started, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
     return _scheduler
 
 
+def _on_run_not_started(event: JobEvent) -> None:
+    """Record scheduled runs APScheduler dropped as skipped executions."""
+    if event.code == EVENT_JOB_MISSED:
+        reason = "Skipped: missed its scheduled time by more than the misfire grace period"
+        run_times = [event.scheduled_run_time]
+    else:
+        reason = "Skipped: too many runs of this job already running or waiting"
+        run_times = event.scheduled_run_times
+    logger.warning(f"Scheduled run of {event.job_id} not started: {reason}")
+
+    async def record() -> None:
+        from .executor import record_skipped_run
+        from .storage import aio
+
+        job = await aio.load_job(event.job_id)
+        if job is None:
+            return
+        for run_time in run_times:
+            await record_skipped_run(job, reason, scheduled_at=run_time)
+
+    task = asyncio.get_event_loop().create_task(record())
+    _pending_records.add(task)
+    task.add_done_callback(_pending_records.discard)
+
+
 def parse_schedule(schedule: str) -> CronTrigger | IntervalTrigger:
     """Parse a schedule string into an APScheduler trigger.
 
@@ -64,10 +98,19 @@ def parse_schedule(schedule: str) -> CronTrigger | IntervalTrigger:
     raise ValueError(f"Cannot parse schedule: {schedule!r}")
 
 
+def in_quiet_hours(windows: list[QuietHours], now: datetime | None = None) -> bool:
+    """Whether now (default: the current time) falls in any of the windows."""
+    t = (now or datetime.now(USER_TZ)).astimezone(USER_TZ).time()
+    return any(window.contains(t) for window in windows)
+
+
 def _make_job_runner(job: Job):
-    """Create an async wrapper that runs the job."""
+    """Create an async wrapper that runs the job, except during its quiet hours."""
     async def runner():
         from .executor import run_job
+        if in_quiet_hours(job.quiet_hours):
+            logger.info(f"Skipping scheduled run of {job.name!r}: quiet hours")
+            return
         await run_job(job)
     return runner
 
@@ -81,6 +124,10 @@ def add_scheduled_job(job: Job) -> None:
         id=job.id,
         name=job.name,
         replace_existing=True,
+        coalesce=job.coalesce,
+        misfire_grace_time=job.misfire_grace_seconds,
+        # run_job enforces max_concurrent itself; this only bounds the backlog
+        max_instances=job.max_concurrent + (0 if job.coalesce else MAX_WAITING_SCHEDULED_RUNS),
     )
     logger.info(f"Scheduled job {job.name!r} ({job.id}) with schedule {job.schedule!r}")
 
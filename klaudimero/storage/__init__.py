@@ -0,0 +1,313 @@
+"""Storage API used by the rest of the service.
+
+Jobs, executions, devices, the notification outbox and chat sessions are
+persisted by a pluggable backend module selected with KLAUDIMERO_STORAGE
+("json", the default, or "sqlite"). Both backends expose the same functions; this module forwards to
+the active one. Heartbeat config and prompt are plain files in either mode.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Collection
+from datetime import datetime, timezone
+from types import ModuleType
+
+from ..config import HEARTBEAT_CONFIG_FILE, HEARTBEAT_PROMPT_FILE, STORAGE_BACKEND
+from ..models import (
+    ChatMessage,
+    ChatSession,
+    ChatSessionSummary,
+    Device,
+    Execution,
+    ExecutionStatus,
+    HeartbeatConfig,
+    Job,
+    OutboxEntry,
+    OutboxStatus,
+)
+from . import json_backend, outputs, sqlite_backend
+
+_BACKENDS: dict[str, ModuleType] = {
+    "json": json_backend,
+    "sqlite": sqlite_backend,
+}
+
+logger = logging.getLogger("klaudimero.storage")
+
+
+def get_backend() -> ModuleType:
+    try:
+        return _BACKENDS[STORAGE_BACKEND]
+    except KeyError:
+        raise ValueError(
+            f"Unknown storage backend {STORAGE_BACKEND!r}, expected one of {sorted(_BACKENDS)}"
+        ) from None
+
+
+def init_storage() -> None:
+    """Prepare the active backend (indexes, schema, one-shot migrations) and
+    cancel executions a previous process left unfinished."""
+    get_backend().init()
+    cancel_interrupted_executions()
+
+
+def cancel_interrupted_executions() -> int:
+    """Mark executions left queued or running by a previous process as cancelled.
+
+    Nothing runs them any more after a restart. Output captured in a live
+    output file is kept as the execution's full output, compressed in
+    chunks, with its beginning as the preview. Returns how many were marked.
+    """
+    interrupted = [
+        execution
+        for status in (ExecutionStatus.queued, ExecutionStatus.running)
+        for execution in _all_executions(status)
+    ]
+    now = datetime.now(timezone.utc)
+    for execution in interrupted:
+        if outputs.store_live_output(execution):
+            # At most 4 bytes per character; externalize trims it to the preview
+            head = outputs.read_live_output(execution.id, 4 * outputs.OUTPUT_PREVIEW_CHARS)
+            execution.output = head.decode("utf-8", errors="ignore")
+        execution.status = ExecutionStatus.cancelled
+        execution.finished_at = now
+        save_execution(execution)
+        outputs.delete_live_output(execution.id)
+    if interrupted:
+        logger.info(f"Marked {len(interrupted)} interrupted execution(s) as cancelled")
+    return len(interrupted)
+
+
+def _all_executions(status: ExecutionStatus) -> list[Execution]:
+    executions, cursor = get_backend().list_executions(None, limit=500, status=status)
+    while cursor:
+        page, cursor = get_backend().list_executions(None, limit=500, cursor=cursor, status=status)
+        executions.extend(page)
+    return executions
+
+
+# --- Jobs ---
+
+def save_job(job: Job) -> None:
+    get_backend().save_job(job)
+
+
+def load_job(job_id: str) -> Job | None:
+    return get_backend().load_job(job_id)
+
+
+def load_all_jobs() -> list[Job]:
+    return get_backend().load_all_jobs()
+
+
+def delete_job(job_id: str) -> bool:
+    return get_backend().delete_job(job_id)
+
+
+# --- Executions ---
+
+def save_execution(execution: Execution) -> None:
+    """Persist the execution. Large outputs are stored out of line (see outputs);
+    the caller's object is left untouched."""
+    get_backend().save_execution(outputs.externalize(execution))
+
+
+def _with_output(execution: Execution | None, full_output: bool) -> Execution | None:
+    if execution is not None and full_output:
+        return outputs.inline(execution)
+    return execution
+
+
+def load_execution(execution_id: str, full_output: bool = False) -> Execution | None:
+    """Load an execution. Large outputs come back as a preview unless full_output."""
+    return _with_output(get_backend().load_execution(execution_id), full_output)
+
+
+def list_executions(
+    job_id: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    status: ExecutionStatus | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    full_output: bool = False,
+) -> tuple[list[Execution], str | None]:
+    """One page of executions, newest start first, optionally filtered.
+
+    since is inclusive and until exclusive, both on started_at. Returns the
+    page and the cursor for the next one (None on the last page). Raises
+    ValueError for a malformed cursor.
+    """
+    executions, next_cursor = get_backend().list_executions(
+        job_id, limit=limit, cursor=cursor, status=status, since=since, until=until
+    )
+    return [_with_output(e, full_output) for e in executions], next_cursor
+
+
+def load_executions_for_job(job_id: str, limit: int = 50) -> list[Execution]:
+    return get_backend().load_executions_for_job(job_id, limit=limit)
+
+
+def load_latest_execution(job_id: str | None = None, full_output: bool = False) -> Execution | None:
+    return _with_output(get_backend().load_latest_execution(job_id), full_output)
+
+
+def read_compressed_output(execution_id: str) -> bytes | None:
+    """The gzipped full output of an execution stored out of line, else None."""
+    return outputs.read_compressed_output(execution_id)
+
+
+def append_live_output(execution_id: str, data: bytes) -> None:
+    """Append raw output of a running execution to its live output file."""
+    outputs.append_live_output(execution_id, data)
+
+
+def read_live_output(
+    execution_id: str, size: int | None = None, offset: int = 0
+) -> bytes | None:
+    """Raw output captured so far for a running execution (at most size
+    bytes of it from offset), else None."""
+    return outputs.read_live_output(execution_id, size, offset)
+
+
+def store_live_output(execution: Execution) -> bool:
+    """Keep a running execution's live output file as its full output.
+
+    Used when the run's output was capped in memory; marks the execution's
+    output as a preview. Returns False if there is no live output.
+    """
+    return outputs.store_live_output(execution)
+
+
+def delete_live_output(execution_id: str) -> None:
+    outputs.delete_live_output(execution_id)
+
+
+def cleanup_old_executions(max_age_days: int = 3) -> int:
+    """Delete execution logs older than max_age_days. Returns number of executions removed."""
+    removed = get_backend().cleanup_old_executions(max_age_days=max_age_days)
+    outputs.delete_outputs(removed)
+    return len(removed)
+
+
+# --- Heartbeat ---
+
+def load_heartbeat_config() -> HeartbeatConfig:
+    if HEARTBEAT_CONFIG_FILE.exists():
+        return HeartbeatConfig.model_validate_json(HEARTBEAT_CONFIG_FILE.read_text())
+    return HeartbeatConfig()
+
+
+def save_heartbeat_config(config: HeartbeatConfig) -> None:
+    HEARTBEAT_CONFIG_FILE.write_text(config.model_dump_json(indent=2))
+
+
+def load_heartbeat_prompt() -> str:
+    if HEARTBEAT_PROMPT_FILE.exists():
+        return HEARTBEAT_PROMPT_FILE.read_text()
+    return ""
+
+
+def save_heartbeat_prompt(prompt: str) -> None:
+    HEARTBEAT_PROMPT_FILE.write_text(prompt)
+
+
+# --- Devices ---
+
+def load_all_devices() -> list[Device]:
+    return get_backend().load_all_devices()
+
+
+def save_device(device: Device) -> None:
+    get_backend().save_device(device)
+
+
+def update_devices(devices: list[Device]) -> None:
+    """Save changes to registered devices; devices no longer registered are ignored."""
+    get_backend().update_devices(devices)
+
+
+def delete_device(token: str) -> bool:
+    return get_backend().delete_device(token)
+
+
+def delete_devices(tokens: list[str]) -> int:
+    """Unregister devices. Returns how many were registered."""
+    return get_backend().delete_devices(tokens)
+
+
+# --- Notification outbox ---
+
+def save_outbox_entry(entry: OutboxEntry) -> None:
+    get_backend().save_outbox_entry(entry)
+
+
+def load_outbox_entry(entry_id: str) -> OutboxEntry | None:
+    return get_backend().load_outbox_entry(entry_id)
+
+
+def load_outbox_entries(status: OutboxStatus | None = None) -> list[OutboxEntry]:
+    """Outbox entries, optionally of one status, soonest next attempt first."""
+    return get_backend().load_outbox_entries(status)
+
+
+def delete_outbox_entry(entry_id: str) -> bool:
+    return get_backend().delete_outbox_entry(entry_id)
+
+
+# --- Chat Sessions ---
+
+def save_chat_session(session: ChatSession) -> None:
+    get_backend().save_chat_session(session)
+
+
+def append_chat_messages(
+    session: ChatSession,
+    messages: list[ChatMessage],
+    fields: Collection[str] = (),
+    claude_seen: int | None = None,
+) -> None:
+    """Add messages to the session (in memory and on disk) and bump updated_at.
+
+    Only the new messages are written; a session that was never saved is
+    written in full. Of the header, only the given fields are written from
+    session, the rest is kept as stored. With claude_seen, the number of
+    messages the session's CLI session had seen before these, its
+    claude_session_messages is advanced from what is actually stored (see
+    chat_headers.merge_chat_header).
+    """
+    get_backend().append_chat_messages(
+        session, messages, fields=fields, claude_seen=claude_seen
+    )
+
+
+def load_chat_session(session_id: str, message_limit: int | None = None) -> ChatSession | None:
+    """Load a session, optionally with only its newest message_limit messages.
+
+    Never pass a session loaded with message_limit to save_chat_session.
+    """
+    return get_backend().load_chat_session(session_id, message_limit=message_limit)
+
+
+def load_all_chat_sessions() -> list[ChatSession]:
+    return get_backend().load_all_chat_sessions()
+
+
+def list_chat_session_summaries(
+    limit: int | None = None, cursor: str | None = None
+) -> tuple[list[ChatSessionSummary], str | None]:
+    """Session summaries, most recently updated first, without loading messages.
+
+    Returns one page and the cursor for the next page (None on the last page).
+    Raises ValueError for a malformed cursor.
+    """
+    return get_backend().list_chat_session_summaries(limit=limit, cursor=cursor)
+
+
+def find_chat_session_by_source(source_type: str, source_id: str) -> ChatSession | None:
+    return get_backend().find_chat_session_by_source(source_type, source_id)
+
+
+def delete_chat_session(session_id: str) -> bool:
+    return get_backend().delete_chat_session(session_id)
@@ -0,0 +1,72 @@
+"""Async storage API for code running on the event loop.
+
+Every function mirrors the one of the same name in klaudimero.storage but
+runs it in a worker thread, so file and database I/O (directory scans, JSON
+parsing, SQLite queries) never stalls other requests or scheduler callbacks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from typing import Awaitable, Callable, ParamSpec, TypeVar
+
+from .. import storage as _storage
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def _offload(fn: Callable[P, R]) -> Callable[P, Awaitable[R]]:
+    @functools.wraps(fn)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return wrapper
+
+
+# --- Jobs ---
+save_job = _offload(_storage.save_job)
+load_job = _offload(_storage.load_job)
+load_all_jobs = _offload(_storage.load_all_jobs)
+delete_job = _offload(_storage.delete_job)
+
+# --- Executions ---
+save_execution = _offload(_storage.save_execution)
+load_execution = _offload(_storage.load_execution)
+list_executions = _offload(_storage.list_executions)
+load_executions_for_job = _offload(_storage.load_executions_for_job)
+load_latest_execution = _offload(_storage.load_latest_execution)
+read_compressed_output = _offload(_storage.read_compressed_output)
+append_live_output = _offload(_storage.append_live_output)
+read_live_output = _offload(_storage.read_live_output)
+store_live_output = _offload(_storage.store_live_output)
+delete_live_output = _offload(_storage.delete_live_output)
+cleanup_old_executions = _offload(_storage.cleanup_old_executions)
+
+# --- Heartbeat ---
+load_heartbeat_config = _offload(_storage.load_heartbeat_config)
+save_heartbeat_config = _offload(_storage.save_heartbeat_config)
+load_heartbeat_prompt = _offload(_storage.load_heartbeat_prompt)
+save_heartbeat_prompt = _offload(_storage.save_heartbeat_prompt)
+
+# --- Devices ---
+load_all_devices = _offload(_storage.load_all_devices)
+save_device = _offload(_storage.save_device)
+update_devices = _offload(_storage.update_devices)
+delete_device = _offload(_storage.delete_device)
+delete_devices = _offload(_storage.delete_devices)
+
+# --- Notification outbox ---
+save_outbox_entry = _offload(_storage.save_outbox_entry)
+load_outbox_entry = _offload(_storage.load_outbox_entry)
+load_outbox_entries = _offload(_storage.load_outbox_entries)
+delete_outbox_entry = _offload(_storage.delete_outbox_entry)
+
+# --- Chat Sessions ---
+save_chat_session = _offload(_storage.save_chat_session)
+append_chat_messages = _offload(_storage.append_chat_messages)
+load_chat_session = _offload(_storage.load_chat_session)
+load_all_chat_sessions = _offload(_storage.load_all_chat_sessions)
+list_chat_session_summaries = _offload(_storage.list_chat_session_summaries)
+find_chat_session_by_source = _offload(_storage.find_chat_session_by_source)
+delete_chat_session = _offload(_storage.delete_chat_session)
@@ -0,0 +1,53 @@
+"""Chat session header updates shared by the storage backends.
+
+Jobs, heartbeats and chat turns append to the same session concurrently,
+each holding its own (possibly partial) copy. An append therefore starts
+from the stored header and writes back only the fields the caller changed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Collection
+
+from ..models import ChatSession
+
+CHAT_HEADER_FIELDS = (
+    "title",
+    "claude_session_id",
+    "claude_session_messages",
+    "context_summary",
+    "summary_through",
+    "updated_at",
+)
+
+
+def merge_chat_header(
+    stored: ChatSession,
+    session: ChatSession,
+    stored_messages: int,
+    added: int,
+    fields: Collection[str],
+    claude_seen: int | None,
+) -> ChatSession:
+    """Apply an append's header changes to the stored session.
+
+    stored_messages is how many messages were stored before the append and
+    added how many it adds. Only fields (and updated_at) are taken from
+    session. claude_seen is the number of messages the CLI session had seen
+    before the new ones: if nothing else was appended in between, the new
+    messages count as seen too; otherwise claude_session_messages stays at
+    claude_seen, so the interleaved messages are sent with the next turn.
+    The merged header fields are copied back onto session.
+    """
+    update = {field: getattr(session, field) for field in fields}
+    update["updated_at"] = session.updated_at
+    if claude_seen is not None:
+        update["claude_session_messages"] = (
+            claude_seen + added
+            if claude_seen == stored_messages
+            else min(claude_seen, stored_messages)
+        )
+    merged = stored.model_copy(update=update)
+    for field in CHAT_HEADER_FIELDS:
+        setattr(session, field, getattr(merged, field))
+    return merged
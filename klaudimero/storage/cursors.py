@@ -0,0 +1,25 @@
+"""Opaque pagination cursors shared by the storage backends.
+
+A cursor marks the last item of a page by its sort key (a timestamp) and
+its id, so the next page starts strictly after it regardless of inserts.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+
+
+def encode_cursor(timestamp: float, item_id: str) -> str:
+    raw = f"{timestamp!r}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, item_id = raw.split("|", 1)
+        return float(timestamp), item_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
@@ -0,0 +1,744 @@
+"""JSON file storage backend: one JSON document per object under ~/.klaudimero."""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from collections.abc import Collection
+from pathlib import Path
+
+from ..config import JOBS_DIR, EXECUTIONS_DIR, EXECUTION_INDEX_FILE, DEVICES_FILE, OUTBOX_DIR, CHAT_SESSIONS_DIR, CHAT_INDEX_FILE
+from ..models import Job, Execution, ExecutionStatus, Device, OutboxEntry, OutboxStatus, ChatMessage, ChatSession, ChatSessionSummary
+from .chat_headers import merge_chat_header
+from .cursors import decode_cursor, encode_cursor
+
+logger = logging.getLogger("klaudimero.storage")
+
+# The in-memory indexes and the files they describe are shared by the event
+# loop and the storage worker threads (see storage.aio); every function that
+# touches them runs under this lock.
+_lock = threading.RLock()
+
+
+def _synchronized(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+@_synchronized
+def init() -> None:
+    executions = ensure_execution_index()
+    sessions = len(_get_chat_index())
+    logger.info(
+        f"JSON storage ready ({executions} indexed executions, {sessions} indexed chat sessions)"
+    )
+
+
+# --- Index journals ---
+#
+# Indexes are dicts of id -> entry persisted as append-only JSONL journals:
+# each change appends {"id": ..., **entry} or an {"id": ..., "deleted": true}
+# tombstone, and replaying the journal yields the index. _write_journal
+# compacts a journal down to one line per live entry.
+
+def _append_journal(path: Path, key: str, entry: dict | None) -> None:
+    record = {"id": key, **entry} if entry is not None else {"id": key, "deleted": True}
+    with path.open("a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _write_journal(path: Path, index: dict[str, dict]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w") as f:
+        for key, entry in index.items():
+            f.write(json.dumps({"id": key, **entry}) + "\n")
+    tmp.replace(path)
+
+
+def _read_journal(path: Path) -> tuple[dict[str, dict], int]:
+    """Replay a journal. Returns the index and the number of records read."""
+    index: dict[str, dict] = {}
+    records = 0
+    with path.open() as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn write from a crash; the entry is recovered on its next save.
+                continue
+            records += 1
+            key = record.pop("id")
+            if record.get("deleted"):
+                index.pop(key, None)
+            else:
+                index[key] = record
+    return index, records
+
+
+# --- Jobs ---
+
+def save_job(job: Job) -> None:
+    path = JOBS_DIR / f"{job.id}.json"
+    path.write_text(job.model_dump_json(indent=2))
+
+
+def load_job(job_id: str) -> Job | None:
+    path = JOBS_DIR / f"{job_id}.json"
+    if not path.exists():
+        return None
+    return Job.model_validate_json(path.read_text())
+
+
+def load_all_jobs() -> list[Job]:
+    jobs = []
+    for path in sorted(JOBS_DIR.glob("*.json")):
+        jobs.append(Job.model_validate_json(path.read_text()))
+    return jobs
+
+
+def delete_job(job_id: str) -> bool:
+    path = JOBS_DIR / f"{job_id}.json"
+    if path.exists():
+        path.unlink()
+        return True
+    return False
+
+
+# --- Executions ---
+
+# Execution index: execution id -> {"job_id", "path", "started_at", "status",
+# "saved_at"}, with "path" relative to EXECUTIONS_DIR. Saving an execution
+# appends a single journal line; the journal is compacted on cleanup.
+#
+# The most recently saved execution (overall and per job) is tracked in memory
+# alongside the index. It is derived from the index once when it is loaded and
+# then maintained by save_execution, so finding the latest never walks history.
+
+_execution_index: dict[str, dict] | None = None
+_latest_execution_id: str | None = None
+_latest_by_job: dict[str, str] = {}
+
+
+def _execution_path(execution: Execution) -> Path:
+    ts = execution.started_at.strftime("%Y%m%dT%H%M%S")
+    return EXECUTIONS_DIR / execution.job_id / f"{ts}_{execution.id}.json"
+
+
+def _index_entry(execution: Execution, path: Path, saved_at: float) -> dict:
+    return {
+        "job_id": execution.job_id,
+        "path": str(path.relative_to(EXECUTIONS_DIR)),
+        "started_at": execution.started_at.isoformat(),
+        "status": execution.status.value,
+        "saved_at": saved_at,
+    }
+
+
+def _saved_at(entry: dict) -> float:
+    # Entries written before saved_at was tracked fall back to the start time
+    saved_at = entry.get("saved_at")
+    if saved_at is None:
+        saved_at = datetime.fromisoformat(entry["started_at"]).timestamp()
+    return saved_at
+
+
+def _recompute_latest_pointers(index: dict[str, dict]) -> None:
+    global _latest_execution_id, _latest_by_job
+    latest_by_job: dict[str, str] = {}
+    for execution_id, entry in index.items():
+        current = latest_by_job.get(entry["job_id"])
+        if current is None or _saved_at(entry) > _saved_at(index[current]):
+            latest_by_job[entry["job_id"]] = execution_id
+    _latest_by_job = latest_by_job
+    _latest_execution_id = max(
+        latest_by_job.values(), key=lambda i: _saved_at(index[i]), default=None
+    )
+
+
+def _drop_index_entries(index: dict[str, dict], execution_ids: list[str]) -> None:
+    for execution_id in execution_ids:
+        index.pop(execution_id, None)
+    if _latest_execution_id in execution_ids or any(
+        i in execution_ids for i in _latest_by_job.values()
+    ):
+        _recompute_latest_pointers(index)
+
+
+@_synchronized
+def rebuild_execution_index() -> int:
+    """Rebuild the execution index by scanning EXECUTIONS_DIR. Returns number of entries."""
+    global _execution_index
+    index: dict[str, dict] = {}
+    for job_dir in EXECUTIONS_DIR.iterdir():
+        if not job_dir.is_dir():
+            continue
+        for path in job_dir.glob("*.json"):
+            try:
+                execution = Execution.model_validate_json(path.read_text())
+            except ValueError:
+                continue
+            index[execution.id] = _index_entry(execution, path, path.stat().st_mtime)
+    _write_journal(EXECUTION_INDEX_FILE, index)
+    _execution_index = index
+    _recompute_latest_pointers(index)
+    return len(index)
+
+
+def _get_execution_index() -> dict[str, dict]:
+    global _execution_index
+    if _execution_index is None:
+        if EXECUTION_INDEX_FILE.exists():
+            _execution_index, _ = _read_journal(EXECUTION_INDEX_FILE)
+            _recompute_latest_pointers(_execution_index)
+        else:
+            rebuild_execution_index()
+    return _execution_index
+
+
+@_synchronized
+def ensure_execution_index() -> int:
+    """Load the execution index, rebuilding it if missing. Returns number of entries."""
+    return len(_get_execution_index())
+
+
+@_synchronized
+def save_execution(execution: Execution) -> None:
+    global _latest_execution_id
+    path = _execution_path(execution)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(execution.model_dump_json(indent=2))
+
+    entry = _index_entry(execution, path, time.time())
+    index = _get_execution_index()
+    index[execution.id] = entry
+    _append_journal(EXECUTION_INDEX_FILE, execution.id, entry)
+    _latest_execution_id = execution.id
+    _latest_by_job[execution.job_id] = execution.id
+
+
+@_synchronized
+def load_execution(execution_id: str) -> Execution | None:
+    index = _get_execution_index()
+    entry = index.get(execution_id)
+    if entry is None:
+        return None
+    path = EXECUTIONS_DIR / entry["path"]
+    if not path.exists():
+        _drop_index_entries(index, [execution_id])
+        _append_journal(EXECUTION_INDEX_FILE, execution_id, None)
+        return None
+    return Execution.model_validate_json(path.read_text())
+
+
+@_synchronized
+def list_executions(
+    job_id: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    status: ExecutionStatus | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[list[Execution], str | None]:
+    # Filter and order on the index; only files on the returned page are read
+    after = decode_cursor(cursor) if cursor is not None else None
+    lower = since.timestamp() if since else None
+    upper = until.timestamp() if until else None
+    index = _get_execution_index()
+    candidates: list[tuple[float, str]] = []
+    for execution_id, entry in index.items():
+        if job_id is not None and entry["job_id"] != job_id:
+            continue
+        if status is not None and entry["status"] != status.value:
+            continue
+        started = datetime.fromisoformat(entry["started_at"]).timestamp()
+        if lower is not None and started < lower:
+            continue
+        if upper is not None and started >= upper:
+            continue
+        if after is not None and (started, execution_id) >= after:
+            continue
+        candidates.append((started, execution_id))
+    candidates.sort(reverse=True)
+
+    executions: list[Execution] = []
+    next_cursor = None
+    for key in candidates:
+        if len(executions) >= limit:
+            last = executions[-1]
+            next_cursor = encode_cursor(last.started_at.timestamp(), last.id)
+            break
+        execution = load_execution(key[1])
+        if execution is not None:
+            executions.append(execution)
+    return executions, next_cursor
+
+
+def load_executions_for_job(job_id: str, limit: int = 50) -> list[Execution]:
+    return list_executions(job_id, limit=limit)[0]
+
+
+@_synchronized
+def load_latest_execution(job_id: str | None = None) -> Execution | None:
+    """Return the most recently saved execution, optionally restricted to one job."""
+    _get_execution_index()
+    while True:
+        execution_id = _latest_by_job.get(job_id) if job_id else _latest_execution_id
+        if execution_id is None:
+            return None
+        # load_execution drops entries whose file vanished and repoints the latest
+        execution = load_execution(execution_id)
+        if execution is not None:
+            return execution
+
+
+@_synchronized
+def cleanup_old_executions(max_age_days: int = 3) -> list[str]:
+    """Delete execution logs older than max_age_days. Returns the removed ids.
+
+    Expired executions are picked from the index by saved_at, so only their
+    files are touched.
+    """
+    cutoff = time.time() - (max_age_days * 86400)
+    index = _get_execution_index()
+    removed_ids = [i for i, entry in index.items() if _saved_at(entry) < cutoff]
+    if not removed_ids:
+        return []
+
+    job_dirs: set[Path] = set()
+    for execution_id in removed_ids:
+        path = EXECUTIONS_DIR / index[execution_id]["path"]
+        path.unlink(missing_ok=True)
+        job_dirs.add(path.parent)
+    # Remove emptied directories
+    for job_dir in job_dirs:
+        if job_dir.is_dir() and not any(job_dir.iterdir()):
+            job_dir.rmdir()
+
+    # Drop removed files from the index and compact the journal
+    _drop_index_entries(index, removed_ids)
+    _write_journal(EXECUTION_INDEX_FILE, index)
+    return removed_ids
+
+
+# --- Devices ---
+#
+# The registry is read from devices.json once and kept in memory; every change
+# is written through to the file.
+
+_devices: dict[str, Device] | None = None
+
+
+def _load_devices_raw() -> list[dict]:
+    if DEVICES_FILE.exists():
+        return json.loads(DEVICES_FILE.read_text())
+    return []
+
+
+def _get_devices() -> dict[str, Device]:
+    global _devices
+    if _devices is None:
+        _devices = {d["token"]: Device.model_validate(d) for d in _load_devices_raw()}
+    return _devices
+
+
+def _save_devices() -> None:
+    devices = [d.model_dump(mode="json") for d in _get_devices().values()]
+    _write_atomic(DEVICES_FILE, json.dumps(devices, indent=2))
+
+
+@_synchronized
+def load_all_devices() -> list[Device]:
+    return [d.model_copy() for d in _get_devices().values()]
+
+
+@_synchronized
+def save_device(device: Device) -> None:
+    devices = _get_devices()
+    # Replace if token already exists
+    devices.pop(device.token, None)
+    devices[device.token] = device.model_copy()
+    _save_devices()
+
+
+@_synchronized
+def update_devices(devices: list[Device]) -> None:
+    registry = _get_devices()
+    changed = [d for d in devices if d.token in registry]
+    for device in changed:
+        registry[device.token] = device.model_copy()
+    if changed:
+        _save_devices()
+
+
+@_synchronized
+def delete_device(token: str) -> bool:
+    return delete_devices([token]) > 0
+
+
+@_synchronized
+def delete_devices(tokens: list[str]) -> int:
+    devices = _get_devices()
+    removed = [devices.pop(token) for token in tokens if token in devices]
+    if removed:
+        _save_devices()
+    return len(removed)
+
+
+# --- Notification outbox ---
+
+def save_outbox_entry(entry: OutboxEntry) -> None:
+    _write_atomic(OUTBOX_DIR / f"{entry.id}.json", entry.model_dump_json(indent=2))
+
+
+def load_outbox_entry(entry_id: str) -> OutboxEntry | None:
+    path = OUTBOX_DIR / f"{entry_id}.json"
+    if not path.exists():
+        return None
+    return OutboxEntry.model_validate_json(path.read_text())
+
+
+def load_outbox_entries(status: OutboxStatus | None = None) -> list[OutboxEntry]:
+    entries = []
+    for path in OUTBOX_DIR.glob("*.json"):
+        try:
+            entry = OutboxEntry.model_validate_json(path.read_text())
+        except (OSError, ValueError):
+            continue  # deleted or being replaced meanwhile
+        if status is None or entry.status == status:
+            entries.append(entry)
+    entries.sort(key=lambda e: e.next_attempt_at)
+    return entries
+
+
+def delete_outbox_entry(entry_id: str) -> bool:
+    path = OUTBOX_DIR / f"{entry_id}.json"
+    if path.exists():
+        path.unlink()
+        return True
+    return False
+
+
+# --- Chat Sessions ---
+#
+# A session is a small header, {id}.json (the session without its messages),
+# plus an append-only message log, {id}.jsonl. Appending writes one
+# {"message": ...} line per message followed by a {"meta": ...} line carrying
+# the new title, updated_at, Claude CLI session and context summary, so adding
+# a message never rewrites history. Meta lines are folded back into the header
+# once enough accumulate (or a torn line from a crash is found) by rewriting
+# the log with messages only.
+# Sessions written before the log existed keep their messages inline in the
+# header until their next save.
+#
+# A summary index (session id -> title, source, updated_at, message_count) is
+# kept as a journal in CHAT_INDEX_FILE and updated on every save, append and
+# delete, so listing sessions never opens the session files. The
+# (source_type, source_id) -> session id map used to find job and heartbeat
+# threads is derived from it in memory.
+
+CHAT_LOG_COMPACT_AFTER = 100
+
+_chat_index: dict[str, dict] | None = None
+_chat_by_source: dict[tuple[str, str], str] = {}
+
+
+def _chat_summary_entry(session: ChatSession, message_count: int) -> dict:
+    return {
+        "title": session.title,
+        "source_type": session.source_type,
+        "source_id": session.source_id,
+        "updated_at": session.updated_at.isoformat(),
+        "message_count": message_count,
+    }
+
+
+def _source_key(entry: dict) -> tuple[str, str] | None:
+    if entry.get("source_type") is None or entry.get("source_id") is None:
+        return None
+    return (entry["source_type"], entry["source_id"])
+
+
+def _rebuild_chat_source_map(index: dict[str, dict]) -> None:
+    global _chat_by_source
+    by_source: dict[tuple[str, str], tuple[str, str]] = {}
+    for session_id, entry in index.items():
+        key = _source_key(entry)
+        # Should a source have several sessions, the most recently updated wins
+        if key and (key not in by_source or entry["updated_at"] > by_source[key][0]):
+            by_source[key] = (entry["updated_at"], session_id)
+    _chat_by_source = {key: session_id for key, (_, session_id) in by_source.items()}
+
+
+@_synchronized
+def rebuild_chat_index() -> int:
+    """Rebuild the chat summary index from the session files. Returns number of entries."""
+    global _chat_index
+    # Installed up front: loading a session may compact it, which updates the index
+    index: dict[str, dict] = {}
+    _chat_index = index
+    for path in CHAT_SESSIONS_DIR.glob("*.json"):
+        session = load_chat_session(path.stem)
+        if session:
+            index[session.id] = _chat_summary_entry(session, len(session.messages))
+    _write_journal(CHAT_INDEX_FILE, index)
+    _rebuild_chat_source_map(index)
+    return len(index)
+
+
+def _get_chat_index() -> dict[str, dict]:
+    global _chat_index
+    if _chat_index is None:
+        if CHAT_INDEX_FILE.exists():
+            _chat_index, records = _read_journal(CHAT_INDEX_FILE)
+            if records > 2 * len(_chat_index) + CHAT_LOG_COMPACT_AFTER:
+                _write_journal(CHAT_INDEX_FILE, _chat_index)
+            _rebuild_chat_source_map(_chat_index)
+        else:
+            rebuild_chat_index()
+    return _chat_index
+
+
+def _update_chat_index(session_id: str, entry: dict | None) -> None:
+    index = _get_chat_index()
+    if entry is None:
+        previous = index.pop(session_id, None)
+        key = _source_key(previous) if previous else None
+        if key and _chat_by_source.get(key) == session_id:
+            _rebuild_chat_source_map(index)
+    else:
+        index[session_id] = entry
+        key = _source_key(entry)
+        if key:
+            _chat_by_source[key] = session_id
+    _append_journal(CHAT_INDEX_FILE, session_id, entry)
+
+
+def _chat_header_path(session_id: str) -> Path:
+    return CHAT_SESSIONS_DIR / f"{session_id}.json"
+
+
+def _chat_log_path(session_id: str) -> Path:
+    return CHAT_SESSIONS_DIR / f"{session_id}.jsonl"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    tmp.replace(path)
+
+
+def _chat_meta(session: ChatSession) -> dict:
+    return {
+        "title": session.title,
+        "updated_at": session.updated_at.isoformat(),
+        "claude_session_id": session.claude_session_id,
+        "claude_session_messages": session.claude_session_messages,
+        "context_summary": session.context_summary,
+        "summary_through": session.summary_through,
+    }
+
+
+@_synchronized
+def save_chat_session(session: ChatSession) -> None:
+    """Write the full session: header plus a freshly compacted message log."""
+    _write_atomic(
+        _chat_log_path(session.id),
+        "".join(
+            json.dumps({"message": m.model_dump(mode="json")}) + "\n"
+            for m in session.messages
+        ),
+    )
+    _write_atomic(
+        _chat_header_path(session.id),
+        session.model_copy(update={"messages": []}).model_dump_json(indent=2),
+    )
+    _update_chat_index(session.id, _chat_summary_entry(session, len(session.messages)))
+
+
+@_synchronized
+def append_chat_messages(
+    session: ChatSession,
+    messages: list[ChatMessage],
+    fields: Collection[str] = (),
+    claude_seen: int | None = None,
+) -> None:
+    """Append messages to the session in memory and to its log on disk.
+
+    The header is rebuilt from the stored one (see merge_chat_header).
+    """
+    session.messages.extend(messages)
+    session.updated_at = datetime.now(timezone.utc)
+    header_path = _chat_header_path(session.id)
+    if not header_path.exists():
+        # New session: write it out in the log format
+        if claude_seen is not None:
+            session.claude_session_messages = claude_seen + len(messages)
+        save_chat_session(session)
+        return
+
+    log_path = _chat_log_path(session.id)
+    if not log_path.exists():
+        # Legacy session with its messages inline. session may have been
+        # loaded with message_limit, so convert the stored messages
+        stored = ChatSession.model_validate_json(header_path.read_text())
+        merged = merge_chat_header(
+            stored, session, len(stored.messages), len(messages), fields, claude_seen
+        )
+        save_chat_session(merged.model_copy(update={"messages": [*stored.messages, *messages]}))
+        return
+
+    stored = load_chat_session(session.id, message_limit=0)
+    previous = _get_chat_index().get(session.id)
+    stored_count = previous["message_count"] if previous else 0
+    merged = merge_chat_header(stored, session, stored_count, len(messages), fields, claude_seen)
+
+    lines = [json.dumps({"message": m.model_dump(mode="json")}) for m in messages]
+    lines.append(json.dumps({"meta": _chat_meta(merged)}))
+    data = ("\n".join(lines) + "\n").encode()
+    with log_path.open("ab+") as f:
+        # Start on a fresh line if a previous append was torn mid-line
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+
+    _update_chat_index(session.id, _chat_summary_entry(merged, stored_count + len(messages)))
+
+
+def _read_lines_reversed(path: Path, block_size: int = 65536):
+    """Yield the non-empty lines of a file from last to first."""
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        rest = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + rest).split(b"\n")
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if rest:
+            yield rest
+
+
+@_synchronized
+def load_chat_session(session_id: str, message_limit: int | None = None) -> ChatSession | None:
+    """Load a session. With message_limit, only the newest messages are read.
+
+    A session loaded with message_limit must not be passed to
+    save_chat_session, which would drop the messages that were not read;
+    append_chat_messages is safe either way.
+    """
+    header_path = _chat_header_path(session_id)
+    if not header_path.exists():
+        return None
+    session = ChatSession.model_validate_json(header_path.read_text())
+    log_path = _chat_log_path(session_id)
+    if not log_path.exists():
+        if message_limit is not None:
+            session.messages = session.messages[-message_limit:] if message_limit else []
+        return session
+
+    if message_limit is not None:
+        messages: list[ChatMessage] = []
+        meta: dict | None = None
+        for line in _read_lines_reversed(log_path):
+            if len(messages) >= message_limit and meta is not None:
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "meta" in record:
+                meta = meta or record["meta"]
+            elif len(messages) < message_limit:
+                messages.append(ChatMessage.model_validate(record["message"]))
+        messages.reverse()
+        return ChatSession.model_validate(
+            {**session.model_dump(), **(meta or {}), "messages": messages}
+        )
+
+    messages = []
+    meta_records = 0
+    torn = False
+    meta: dict = {}
+    with log_path.open() as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                torn = True
+                continue
+            if "meta" in record:
+                meta = record["meta"]
+                meta_records += 1
+            else:
+                messages.append(ChatMessage.model_validate(record["message"]))
+    session = ChatSession.model_validate(
+        {**session.model_dump(), **meta, "messages": messages}
+    )
+    if torn or meta_records >= CHAT_LOG_COMPACT_AFTER:
+        save_chat_session(session)
+    return session
+
+
+@_synchronized
+def load_all_chat_sessions() -> list[ChatSession]:
+    sessions = []
+    for path in CHAT_SESSIONS_DIR.glob("*.json"):
+        session = load_chat_session(path.stem)
+        if session:
+            sessions.append(session)
+    sessions.sort(key=lambda s: s.updated_at, reverse=True)
+    return sessions
+
+
+@_synchronized
+def list_chat_session_summaries(
+    limit: int | None = None, cursor: str | None = None
+) -> tuple[list[ChatSessionSummary], str | None]:
+    summaries = sorted(
+        (
+            ChatSessionSummary(id=session_id, **entry)
+            for session_id, entry in _get_chat_index().items()
+        ),
+        key=lambda s: (s.updated_at.timestamp(), s.id),
+        reverse=True,
+    )
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        summaries = [s for s in summaries if (s.updated_at.timestamp(), s.id) < after]
+    if limit is None or len(summaries) <= limit:
+        return summaries, None
+    page = summaries[:limit]
+    return page, encode_cursor(page[-1].updated_at.timestamp(), page[-1].id)
+
+
+@_synchronized
+def find_chat_session_by_source(source_type: str, source_id: str) -> ChatSession | None:
+    _get_chat_index()
+    session_id = _chat_by_source.get((source_type, source_id))
+    return load_chat_session(session_id) if session_id else None
+
+
+@_synchronized
+def delete_chat_session(session_id: str) -> bool:
+    path = _chat_header_path(session_id)
+    if path.exists():
+        path.unlink()
+        _chat_log_path(session_id).unlink(missing_ok=True)
+        _update_chat_index(session_id, None)
+        return True
+    return False
@@ -0,0 +1,136 @@
+"""Out-of-line, compressed storage for large execution outputs.
+
+Outputs above OUTPUT_INLINE_LIMIT bytes are gzipped to OUTPUTS_DIR/{id}.txt.gz
+and the stored execution record keeps only a preview plus the output's size
+and SHA-256. While an execution runs, its raw output is appended to
+OUTPUTS_DIR/{id}.live as it arrives; when the run kept only part of its
+output in memory, the live file becomes the stored full output. Used by the
+storage facade for every backend.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+from pathlib import Path
+
+from ..config import OUTPUTS_DIR
+from ..models import Execution
+
+OUTPUT_INLINE_LIMIT = 4096
+OUTPUT_PREVIEW_CHARS = 500
+# Larger full outputs are not loaded into records; they are served by the
+# output endpoint only
+OUTPUT_LOAD_LIMIT = 8 * 1024 * 1024
+
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def _output_path(execution_id: str) -> Path:
+    return OUTPUTS_DIR / f"{execution_id}.txt.gz"
+
+
+def externalize(execution: Execution) -> Execution:
+    """Return the record to persist: the execution itself if its output is
+    small, otherwise a copy holding a preview, with the full output written
+    to its compressed file."""
+    if execution.output_is_preview:
+        if len(execution.output) <= OUTPUT_PREVIEW_CHARS:
+            return execution
+        return execution.model_copy(update={"output": execution.output[:OUTPUT_PREVIEW_CHARS]})
+    data = execution.output.encode("utf-8")
+    if len(data) <= OUTPUT_INLINE_LIMIT:
+        return execution
+    path = _output_path(execution.id)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(gzip.compress(data, compresslevel=6))
+    tmp.replace(path)
+    return execution.model_copy(update={
+        "output": execution.output[:OUTPUT_PREVIEW_CHARS],
+        "output_is_preview": True,
+        "output_size": len(data),
+        "output_sha256": hashlib.sha256(data).hexdigest(),
+    })
+
+
+def read_compressed_output(execution_id: str) -> bytes | None:
+    """The gzipped full output as stored, or None if it is not stored out of line."""
+    path = _output_path(execution_id)
+    return path.read_bytes() if path.exists() else None
+
+
+def inline(execution: Execution) -> Execution:
+    """Return the execution with its full output loaded, if it was a preview."""
+    if not execution.output_is_preview:
+        return execution
+    if execution.output_size is not None and execution.output_size > OUTPUT_LOAD_LIMIT:
+        return execution
+    compressed = read_compressed_output(execution.id)
+    if compressed is None:
+        return execution
+    return execution.model_copy(update={
+        "output": gzip.decompress(compressed).decode("utf-8", errors="replace"),
+        "output_is_preview": False,
+    })
+
+
+def delete_outputs(execution_ids: list[str]) -> None:
+    for execution_id in execution_ids:
+        _output_path(execution_id).unlink(missing_ok=True)
+        _live_output_path(execution_id).unlink(missing_ok=True)
+
+
+# --- Live output of running executions ---
+
+def _live_output_path(execution_id: str) -> Path:
+    return OUTPUTS_DIR / f"{execution_id}.live"
+
+
+def append_live_output(execution_id: str, data: bytes) -> None:
+    with _live_output_path(execution_id).open("ab") as f:
+        f.write(data)
+
+
+def read_live_output(
+    execution_id: str, size: int | None = None, offset: int = 0
+) -> bytes | None:
+    """Raw output captured so far (at most size bytes of it from offset), or
+    None if the execution is not running."""
+    path = _live_output_path(execution_id)
+    try:
+        with path.open("rb") as f:
+            f.seek(offset)
+            return f.read(-1 if size is None else size)
+    except FileNotFoundError:
+        return None
+
+
+def store_live_output(execution: Execution) -> bool:
+    """Compress the execution's live output file into its stored full output.
+
+    For runs whose output was capped in memory. The execution is marked as
+    holding a preview, with the size and SHA-256 of the file; its output
+    itself is left as is. Returns False if there is no live output file.
+    """
+    live = _live_output_path(execution.id)
+    path = _output_path(execution.id)
+    tmp = path.with_name(path.name + ".tmp")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with live.open("rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+            while chunk := src.read(_COPY_CHUNK_BYTES):
+                digest.update(chunk)
+                size += len(chunk)
+                dst.write(chunk)
+    except FileNotFoundError:
+        return False
+    tmp.replace(path)
+    execution.output_is_preview = True
+    execution.output_size = size
+    execution.output_sha256 = digest.hexdigest()
+    return True
+
+
+def delete_live_output(execution_id: str) -> None:
+    _live_output_path(execution_id).unlink(missing_ok=True)
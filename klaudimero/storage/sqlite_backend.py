@@ -0,0 +1,566 @@
+"""SQLite storage backend.
+
+Everything lives in one WAL-mode database (SQLITE_DB_FILE). Each object is
+stored as its JSON document next to the columns we filter and sort on, so
+listing, lookups and retention are indexed queries. On first start the
+existing JSON tree is imported once (see migrate_from_json).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Collection
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ..config import CHAT_SESSIONS_DIR, DEVICES_FILE, EXECUTIONS_DIR, JOBS_DIR, OUTBOX_DIR, SQLITE_DB_FILE
+from ..models import (
+    ChatMessage,
+    ChatSession,
+    ChatSessionSummary,
+    Device,
+    Execution,
+    ExecutionStatus,
+    Job,
+    OutboxEntry,
+    OutboxStatus,
+)
+from . import json_backend
+from .chat_headers import merge_chat_header
+from .cursors import decode_cursor, encode_cursor
+
+logger = logging.getLogger("klaudimero.storage")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS executions (
+    id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS executions_job_started ON executions (job_id, started_at);
+CREATE INDEX IF NOT EXISTS executions_job_saved ON executions (job_id, saved_at);
+CREATE INDEX IF NOT EXISTS executions_saved ON executions (saved_at);
+CREATE INDEX IF NOT EXISTS executions_started ON executions (started_at);
+CREATE TABLE IF NOT EXISTS devices (
+    token TEXT PRIMARY KEY,
+    registered_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_status_next ON outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id TEXT PRIMARY KEY,
+    source_type TEXT,
+    source_id TEXT,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+DROP INDEX IF EXISTS chat_sessions_source;
+CREATE INDEX IF NOT EXISTS chat_sessions_source_updated
+    ON chat_sessions (source_type, source_id, updated_at);
+CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions (updated_at);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.RLock()
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(SQLITE_DB_FILE, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def _execute(sql: str, params: tuple = ()) -> list[tuple]:
+    with _lock:
+        return _connect().execute(sql, params).fetchall()
+
+
+def _transaction(fn, *args) -> None:
+    """Run fn(conn, *args) inside a single write transaction."""
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fn(conn, *args)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def init() -> None:
+    _connect()
+    if not _execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'"):
+        migrate_from_json()
+    if not _execute("SELECT 1 FROM meta WHERE key = 'chat_messages_split'"):
+        _transaction(_split_inline_chat_messages)
+    logger.info(f"SQLite storage ready at {SQLITE_DB_FILE}")
+
+
+# --- Jobs ---
+
+def _upsert_job(conn: sqlite3.Connection, job: Job) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO jobs (id, data) VALUES (?, ?)",
+        (job.id, job.model_dump_json()),
+    )
+
+
+def save_job(job: Job) -> None:
+    with _lock:
+        _upsert_job(_connect(), job)
+
+
+def load_job(job_id: str) -> Job | None:
+    rows = _execute("SELECT data FROM jobs WHERE id = ?", (job_id,))
+    return Job.model_validate_json(rows[0][0]) if rows else None
+
+
+def load_all_jobs() -> list[Job]:
+    rows = _execute("SELECT data FROM jobs ORDER BY id")
+    return [Job.model_validate_json(data) for (data,) in rows]
+
+
+def delete_job(job_id: str) -> bool:
+    with _lock:
+        return _connect().execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+
+# --- Executions ---
+
+def _upsert_execution(conn: sqlite3.Connection, execution: Execution, saved_at: float) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO executions (id, job_id, started_at, status, saved_at, data)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            execution.id,
+            execution.job_id,
+            execution.started_at.timestamp(),
+            execution.status.value,
+            saved_at,
+            execution.model_dump_json(),
+        ),
+    )
+
+
+def save_execution(execution: Execution) -> None:
+    with _lock:
+        _upsert_execution(_connect(), execution, time.time())
+
+
+def load_execution(execution_id: str) -> Execution | None:
+    rows = _execute("SELECT data FROM executions WHERE id = ?", (execution_id,))
+    return Execution.model_validate_json(rows[0][0]) if rows else None
+
+
+def list_executions(
+    job_id: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    status: ExecutionStatus | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[list[Execution], str | None]:
+    clauses: list[str] = []
+    params: list = []
+    if job_id is not None:
+        clauses.append("job_id = ?")
+        params.append(job_id)
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status.value)
+    if since is not None:
+        clauses.append("started_at >= ?")
+        params.append(since.timestamp())
+    if until is not None:
+        clauses.append("started_at < ?")
+        params.append(until.timestamp())
+    if cursor is not None:
+        ts, execution_id = decode_cursor(cursor)
+        clauses.append("(started_at < ? OR (started_at = ? AND id < ?))")
+        params += [ts, ts, execution_id]
+
+    sql = "SELECT id, started_at, data FROM executions"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    # Fetch one extra row to know whether there is a next page
+    sql += " ORDER BY started_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    rows = _execute(sql, tuple(params))
+
+    executions = [Execution.model_validate_json(data) for _, _, data in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        execution_id, started_at, _ = rows[limit - 1]
+        next_cursor = encode_cursor(started_at, execution_id)
+    return executions, next_cursor
+
+
+def load_executions_for_job(job_id: str, limit: int = 50) -> list[Execution]:
+    return list_executions(job_id, limit=limit)[0]
+
+
+def load_latest_execution(job_id: str | None = None) -> Execution | None:
+    if job_id:
+        rows = _execute(
+            "SELECT data FROM executions WHERE job_id = ? ORDER BY saved_at DESC LIMIT 1",
+            (job_id,),
+        )
+    else:
+        rows = _execute("SELECT data FROM executions ORDER BY saved_at DESC LIMIT 1")
+    return Execution.model_validate_json(rows[0][0]) if rows else None
+
+
+def cleanup_old_executions(max_age_days: int = 3) -> list[str]:
+    """Delete executions older than max_age_days. Returns the removed ids."""
+    cutoff = time.time() - (max_age_days * 86400)
+    removed: list[str] = []
+
+    def _delete(conn: sqlite3.Connection) -> None:
+        rows = conn.execute("SELECT id FROM executions WHERE saved_at < ?", (cutoff,))
+        removed.extend(execution_id for (execution_id,) in rows.fetchall())
+        conn.execute("DELETE FROM executions WHERE saved_at < ?", (cutoff,))
+
+    _transaction(_delete)
+    return removed
+
+
+# --- Devices ---
+
+def _upsert_device(conn: sqlite3.Connection, device: Device) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO devices (token, registered_at, data) VALUES (?, ?, ?)",
+        (device.token, device.registered_at.timestamp(), device.model_dump_json()),
+    )
+
+
+def load_all_devices() -> list[Device]:
+    rows = _execute("SELECT data FROM devices ORDER BY registered_at")
+    return [Device.model_validate_json(data) for (data,) in rows]
+
+
+def save_device(device: Device) -> None:
+    with _lock:
+        _upsert_device(_connect(), device)
+
+
+def update_devices(devices: list[Device]) -> None:
+    with _lock:
+        _connect().executemany(
+            "UPDATE devices SET data = ? WHERE token = ?",
+            [(device.model_dump_json(), device.token) for device in devices],
+        )
+
+
+def delete_device(token: str) -> bool:
+    with _lock:
+        return _connect().execute("DELETE FROM devices WHERE token = ?", (token,)).rowcount > 0
+
+
+def delete_devices(tokens: list[str]) -> int:
+    with _lock:
+        return _connect().executemany(
+            "DELETE FROM devices WHERE token = ?", [(token,) for token in tokens]
+        ).rowcount
+
+
+# --- Notification outbox ---
+
+def _upsert_outbox_entry(conn: sqlite3.Connection, entry: OutboxEntry) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO outbox (id, status, next_attempt_at, data) VALUES (?, ?, ?, ?)",
+        (entry.id, entry.status.value, entry.next_attempt_at.timestamp(), entry.model_dump_json()),
+    )
+
+
+def save_outbox_entry(entry: OutboxEntry) -> None:
+    with _lock:
+        _upsert_outbox_entry(_connect(), entry)
+
+
+def load_outbox_entry(entry_id: str) -> OutboxEntry | None:
+    rows = _execute("SELECT data FROM outbox WHERE id = ?", (entry_id,))
+    return OutboxEntry.model_validate_json(rows[0][0]) if rows else None
+
+
+def load_outbox_entries(status: OutboxStatus | None = None) -> list[OutboxEntry]:
+    if status is None:
+        rows = _execute("SELECT data FROM outbox ORDER BY next_attempt_at")
+    else:
+        rows = _execute(
+            "SELECT data FROM outbox WHERE status = ? ORDER BY next_attempt_at", (status.value,)
+        )
+    return [OutboxEntry.model_validate_json(data) for (data,) in rows]
+
+
+def delete_outbox_entry(entry_id: str) -> bool:
+    with _lock:
+        return _connect().execute("DELETE FROM outbox WHERE id = ?", (entry_id,)).rowcount > 0
+
+
+# --- Chat Sessions ---
+#
+# Session rows hold the session without its messages; messages are rows in
+# chat_messages keyed by (session_id, seq), so appending is an INSERT and
+# loading the newest N messages is a bounded range scan.
+
+def _upsert_chat_header(conn: sqlite3.Connection, session: ChatSession) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO chat_sessions (id, source_type, source_id, updated_at, data)"
+        " VALUES (?, ?, ?, ?, ?)",
+        (
+            session.id,
+            session.source_type,
+            session.source_id,
+            session.updated_at.timestamp(),
+            session.model_copy(update={"messages": []}).model_dump_json(),
+        ),
+    )
+
+
+def _insert_chat_messages(
+    conn: sqlite3.Connection, session_id: str, messages: list[ChatMessage], first_seq: int
+) -> None:
+    conn.executemany(
+        "INSERT INTO chat_messages (session_id, seq, data) VALUES (?, ?, ?)",
+        [(session_id, first_seq + i, m.model_dump_json()) for i, m in enumerate(messages)],
+    )
+
+
+def _upsert_chat_session(conn: sqlite3.Connection, session: ChatSession) -> None:
+    _upsert_chat_header(conn, session)
+    conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session.id,))
+    _insert_chat_messages(conn, session.id, session.messages, 0)
+
+
+def save_chat_session(session: ChatSession) -> None:
+    _transaction(_upsert_chat_session, session)
+
+
+def _append_chat_messages(
+    conn: sqlite3.Connection,
+    session: ChatSession,
+    messages: list[ChatMessage],
+    fields: Collection[str],
+    claude_seen: int | None,
+) -> None:
+    row = conn.execute("SELECT data FROM chat_sessions WHERE id = ?", (session.id,)).fetchone()
+    if not row:
+        if claude_seen is not None:
+            session.claude_session_messages = claude_seen + len(messages)
+        _upsert_chat_session(conn, session)
+        return
+    (stored_count, next_seq) = conn.execute(
+        "SELECT COUNT(*), COALESCE(MAX(seq) + 1, 0) FROM chat_messages WHERE session_id = ?",
+        (session.id,),
+    ).fetchone()
+    stored = ChatSession.model_validate_json(row[0])
+    merged = merge_chat_header(stored, session, stored_count, len(messages), fields, claude_seen)
+    _upsert_chat_header(conn, merged)
+    _insert_chat_messages(conn, session.id, messages, next_seq)
+
+
+def append_chat_messages(
+    session: ChatSession,
+    messages: list[ChatMessage],
+    fields: Collection[str] = (),
+    claude_seen: int | None = None,
+) -> None:
+    session.messages.extend(messages)
+    session.updated_at = datetime.now(timezone.utc)
+    _transaction(_append_chat_messages, session, messages, fields, claude_seen)
+
+
+def _load_chat_messages(session_id: str, message_limit: int | None) -> list[ChatMessage]:
+    if message_limit is None:
+        rows = _execute(
+            "SELECT data FROM chat_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        )
+    else:
+        rows = _execute(
+            "SELECT data FROM chat_messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, message_limit),
+        )[::-1]
+    return [ChatMessage.model_validate_json(data) for (data,) in rows]
+
+
+def _session_from_row(data: str, message_limit: int | None = None) -> ChatSession:
+    session = ChatSession.model_validate_json(data)
+    session.messages = _load_chat_messages(session.id, message_limit)
+    return session
+
+
+def load_chat_session(session_id: str, message_limit: int | None = None) -> ChatSession | None:
+    rows = _execute("SELECT data FROM chat_sessions WHERE id = ?", (session_id,))
+    return _session_from_row(rows[0][0], message_limit) if rows else None
+
+
+def load_all_chat_sessions() -> list[ChatSession]:
+    rows = _execute("SELECT data FROM chat_sessions ORDER BY updated_at DESC")
+    return [_session_from_row(data) for (data,) in rows]
+
+
+def list_chat_session_summaries(
+    limit: int | None = None, cursor: str | None = None
+) -> tuple[list[ChatSessionSummary], str | None]:
+    sql = (
+        "SELECT s.id, s.updated_at, s.data,"
+        " (SELECT COUNT(*) FROM chat_messages m WHERE m.session_id = s.id)"
+        " FROM chat_sessions s"
+    )
+    params: list = []
+    if cursor is not None:
+        ts, session_id = decode_cursor(cursor)
+        sql += " WHERE s.updated_at < ? OR (s.updated_at = ? AND s.id < ?)"
+        params += [ts, ts, session_id]
+    sql += " ORDER BY s.updated_at DESC, s.id DESC"
+    if limit is not None:
+        # Fetch one extra row to know whether there is a next page
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    rows = _execute(sql, tuple(params))
+
+    summaries = []
+    for _, _, data, message_count in rows[:limit]:
+        header = ChatSession.model_validate_json(data)
+        summaries.append(ChatSessionSummary(
+            id=header.id,
+            title=header.title,
+            source_type=header.source_type,
+            source_id=header.source_id,
+            updated_at=header.updated_at,
+            message_count=message_count,
+        ))
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        session_id, updated_at, _, _ = rows[limit - 1]
+        next_cursor = encode_cursor(updated_at, session_id)
+    return summaries, next_cursor
+
+
+def find_chat_session_by_source(source_type: str, source_id: str) -> ChatSession | None:
+    rows = _execute(
+        "SELECT data FROM chat_sessions WHERE source_type = ? AND source_id = ?"
+        " ORDER BY updated_at DESC LIMIT 1",
+        (source_type, source_id),
+    )
+    return _session_from_row(rows[0][0]) if rows else None
+
+
+def _delete_chat_session(conn: sqlite3.Connection, session_id: str) -> None:
+    conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+    conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+
+
+def delete_chat_session(session_id: str) -> bool:
+    if not _execute("SELECT 1 FROM chat_sessions WHERE id = ?", (session_id,)):
+        return False
+    _transaction(_delete_chat_session, session_id)
+    return True
+
+
+def _split_inline_chat_messages(conn: sqlite3.Connection) -> None:
+    """Move messages stored inline in chat_sessions.data into chat_messages."""
+    for (data,) in conn.execute("SELECT data FROM chat_sessions").fetchall():
+        session = ChatSession.model_validate_json(data)
+        if session.messages:
+            _upsert_chat_session(conn, session)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('chat_messages_split', '1')")
+
+
+# --- Migration ---
+
+def migrate_from_json() -> dict[str, int]:
+    """Import the JSON file tree into the database in a single transaction.
+
+    Runs once, the first time the SQLite backend starts; the JSON files are
+    left in place. Files that can't be read or parsed (e.g. torn by a crash)
+    are logged and skipped. Returns the number of imported objects per kind
+    and of skipped files.
+    """
+    counts = dict.fromkeys(
+        ("jobs", "executions", "devices", "outbox", "chat_sessions", "skipped"), 0
+    )
+
+    def _read(path: Path, parse):
+        try:
+            return parse(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping {path} in JSON migration: {e}")
+            counts["skipped"] += 1
+            return None
+
+    def _import(conn: sqlite3.Connection) -> None:
+        for path in JOBS_DIR.glob("*.json"):
+            job = _read(path, lambda p: Job.model_validate_json(p.read_text()))
+            if job:
+                _upsert_job(conn, job)
+                counts["jobs"] += 1
+
+        for path in EXECUTIONS_DIR.glob("*/*.json"):
+            execution = _read(path, lambda p: Execution.model_validate_json(p.read_text()))
+            if execution:
+                _upsert_execution(conn, execution, path.stat().st_mtime)
+                counts["executions"] += 1
+
+        if DEVICES_FILE.exists():
+            devices = _read(
+                DEVICES_FILE,
+                lambda p: [Device.model_validate(raw) for raw in json.loads(p.read_text())],
+            )
+            for device in devices or []:
+                _upsert_device(conn, device)
+                counts["devices"] += 1
+
+        for path in OUTBOX_DIR.glob("*.json"):
+            entry = _read(path, lambda p: OutboxEntry.model_validate_json(p.read_text()))
+            if entry:
+                _upsert_outbox_entry(conn, entry)
+                counts["outbox"] += 1
+
+        for path in CHAT_SESSIONS_DIR.glob("*.json"):
+            session = _read(path, lambda p: json_backend.load_chat_session(p.stem))
+            if session:
+                _upsert_chat_session(conn, session)
+                counts["chat_sessions"] += 1
+
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+            (json.dumps({"at": time.time(), **counts}),),
+        )
+
+    _transaction(_import)
+    logger.info(f"Migrated JSON storage into SQLite: {counts}")
+    return counts
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+
+from .storage import aio
+
+logger = logging.getLogger("klaudimero.streams")
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Chunks a subscriber may have queued; beyond that it catches up from the
+# live output file instead, so a slow client doesn't hold output in memory
+SUBSCRIBER_QUEUE_CHUNKS = 64
+
+
+class Subscription:
+    """One subscriber's queue of (offset, data) chunks, None marking the end.
+
+    lagging means chunks were dropped (or, initially, that the output written
+    before subscribing was never queued): the subscriber must read the live
+    output file from where it is before relying on the queue again.
+    """
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_CHUNKS)
+        self.lagging = True
+
+
+class OutputStream:
+    """Fan-out of a running execution's output to live subscribers.
+
+    Chunks are published as (offset, data) with the byte offset of data in the
+    execution's live output file, so a subscriber that reads the file can skip
+    whatever it already sent.
+    """
+
+    def __init__(self) -> None:
+        self.closed = False
+        self._subscribers: set[Subscription] = set()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        if self.closed:
+            subscription.queue.put_nowait(None)
+        else:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, offset: int, data: bytes) -> None:
+        for subscription in self._subscribers:
+            if subscription.lagging:
+                continue
+            try:
+                subscription.queue.put_nowait((offset, data))
+            except asyncio.QueueFull:
+                subscription.lagging = True
+
+    def close(self) -> None:
+        self.closed = True
+        for subscription in self._subscribers:
+            try:
+                subscription.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass  # the subscriber sees closed once it has drained the queue
+        self._subscribers.clear()
+
+
+_streams: dict[str, OutputStream] = {}
+
+
+def get_stream(execution_id: str) -> OutputStream | None:
+    return _streams.get(execution_id)
+
+
+def live_output(execution_id: str) -> Callable[[bytes], Awaitable[None]]:
+    """Start live capture for an execution.
+
+    Returns an on_output callback for runner.run_claude that appends each
+    chunk to the execution's live output file and publishes it to
+    subscribers. The caller must call finish_capture once the final
+    execution record is saved.
+    """
+    stream = _streams.setdefault(execution_id, OutputStream())
+    offset = 0
+
+    async def on_output(chunk: bytes) -> None:
+        nonlocal offset
+        await aio.append_live_output(execution_id, chunk)
+        stream.publish(offset, chunk)
+        offset += len(chunk)
+
+    return on_output
+
+
+async def finish_capture(execution_id: str) -> None:
+    """End live streaming for an execution and drop its live output file."""
+    stream = _streams.pop(execution_id, None)
+    if stream is not None:
+        stream.close()
+    await aio.delete_live_output(execution_id)
@@ -0,0 +1,18 @@
+"""Shared test setup.
+
+Storage paths are derived from $HOME when klaudimero.config is imported, so
+HOME points at a throwaway directory before any test imports klaudimero.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ["HOME"] = tempfile.mkdtemp(prefix="klaudimero-test-")
+atexit.register(shutil.rmtree, os.environ["HOME"], ignore_errors=True)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,188 @@
+"""Pushes to many devices go out concurrently over one shared APNs client.
+
+A local HTTP/2 server stands in for APNs: it answers every request after a
+fixed delay and counts connections and requests in flight. The real aioapns
+client is used, with its connection pool pointed at the server over
+cleartext HTTP/2, so pooling and stream multiplexing are exercised as they
+are against Apple.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import aioapns
+import pytest
+from aioapns.connection import APNsProductionClientProtocol
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import DataReceived, RequestReceived, StreamEnded
+
+from klaudimero import apns
+from klaudimero.config import APNS_CONFIG_FILE
+
+SEND_SECONDS = 0.05
+DEVICES = 150
+
+
+class FakeAPNsServer(asyncio.Protocol):
+    """One HTTP/2 connection of the fake APNs endpoint."""
+
+    connections = 0
+    in_flight = 0
+    peak_in_flight = 0
+    delivered: list[str] = []
+
+    def __init__(self) -> None:
+        self.conn = H2Connection(H2Configuration(client_side=False))
+        self.transport: asyncio.Transport | None = None
+        self.requests: dict[int, dict[bytes, bytes]] = {}
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.connections = cls.in_flight = cls.peak_in_flight = 0
+        cls.delivered = []
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        FakeAPNsServer.connections += 1
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data: bytes) -> None:
+        for event in self.conn.receive_data(data):
+            if isinstance(event, RequestReceived):
+                self.requests[event.stream_id] = dict(event.headers)
+            elif isinstance(event, DataReceived):
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, StreamEnded):
+                FakeAPNsServer.in_flight += 1
+                FakeAPNsServer.peak_in_flight = max(
+                    FakeAPNsServer.peak_in_flight, FakeAPNsServer.in_flight
+                )
+                asyncio.get_running_loop().call_later(SEND_SECONDS, self.respond, event.stream_id)
+        self.transport.write(self.conn.data_to_send())
+
+    def respond(self, stream_id: int) -> None:
+        FakeAPNsServer.in_flight -= 1
+        if self.transport.is_closing():
+            return
+        headers = self.requests.pop(stream_id)
+        FakeAPNsServer.delivered.append(headers[b":path"].decode().rsplit("/", 1)[-1])
+        self.conn.send_headers(
+            stream_id, [(":status", "200"), ("apns-id", headers[b"apns-id"])], end_stream=True
+        )
+        self.transport.write(self.conn.data_to_send())
+
+
+def _signing_key() -> str:
+    key = ec.generate_private_key(ec.SECP256R1())
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+@pytest.fixture
+def fake_apns(tmp_path, monkeypatch):
+    """Configure push with a throwaway key; returns the list of built clients.
+
+    The fake server is started by run_with_server, inside the test's loop.
+    """
+    key_file = tmp_path / "key.p8"
+    key_file.write_text(_signing_key())
+    APNS_CONFIG_FILE.write_text(
+        json.dumps(
+            {"key_file": str(key_file), "key_id": "K", "team_id": "T", "bundle_id": "app.test"}
+        )
+    )
+    FakeAPNsServer.reset()
+    monkeypatch.setattr(apns, "_client", None)
+    monkeypatch.setattr(apns, "_client_source", None)
+    # Each test runs its own event loop
+    monkeypatch.setattr(apns, "_client_lock", asyncio.Lock())
+    monkeypatch.setattr(apns, "_send_slots", asyncio.Semaphore(apns.APNS_SEND_CONCURRENCY))
+
+    real_apns = aioapns.APNs
+    built: list[aioapns.APNs] = []
+
+    def local_apns(**kwargs) -> aioapns.APNs:
+        client = real_apns(**kwargs)
+        client.pool.protocol_class = type(
+            "LocalAPNsProtocol",
+            (APNsProductionClientProtocol,),
+            {"APNS_SERVER": "127.0.0.1", "APNS_PORT": local_apns.port},
+        )
+        client.pool.ssl_context = None  # cleartext HTTP/2 with prior knowledge
+        built.append(client)
+        return client
+
+    monkeypatch.setattr(aioapns, "APNs", local_apns)
+    yield local_apns, built
+    APNS_CONFIG_FILE.unlink()
+
+
+async def run_with_server(factory, coro_fn):
+    server = await asyncio.get_running_loop().create_server(FakeAPNsServer, "127.0.0.1", 0)
+    factory.port = server.sockets[0].getsockname()[1]
+    try:
+        return await coro_fn()
+    finally:
+        if apns._client is not None:
+            apns._client.pool.close()
+        server.close()
+        await server.wait_closed()
+
+
+MESSAGE = {"aps": {"alert": {"title": "Job done", "body": "ok"}}}
+TOKENS = [f"{i:064x}" for i in range(DEVICES)]
+
+
+def test_fan_out_is_concurrent_and_reuses_client(fake_apns):
+    factory, built = fake_apns
+
+    async def deliver_twice() -> tuple[list[apns.DeliveryReport], float]:
+        reports = []
+        started = time.monotonic()
+        for _ in range(2):
+            reports.append(await apns.deliver(MESSAGE, TOKENS))
+        return reports, time.monotonic() - started
+
+    reports, elapsed = asyncio.run(run_with_server(factory, deliver_twice))
+
+    for report in reports:
+        assert sorted(report.delivered) == TOKENS
+        assert not report.retry and not report.rejected
+    assert sorted(FakeAPNsServer.delivered) == sorted(TOKENS * 2)
+    # One client, multiplexing every request over a single connection
+    assert len(built) == 1
+    assert FakeAPNsServer.connections == 1
+    assert FakeAPNsServer.peak_in_flight == apns.APNS_SEND_CONCURRENCY
+
+    batches = -(-DEVICES // apns.APNS_SEND_CONCURRENCY)
+    sequential = 2 * DEVICES * SEND_SECONDS
+    assert elapsed < sequential / 4
+    assert elapsed >= 2 * batches * SEND_SECONDS * 0.9
+
+
+def test_concurrent_deliveries_share_the_limit(fake_apns):
+    factory, built = fake_apns
+
+    async def deliver_together() -> list[apns.DeliveryReport]:
+        return await asyncio.gather(
+            apns.deliver(MESSAGE, TOKENS[: DEVICES // 2]),
+            apns.deliver(MESSAGE, TOKENS[DEVICES // 2:]),
+        )
+
+    reports = asyncio.run(run_with_server(factory, deliver_together))
+
+    assert sorted(reports[0].delivered + reports[1].delivered) == TOKENS
+    assert len(built) == 1
+    assert FakeAPNsServer.peak_in_flight == apns.APNS_SEND_CONCURRENCY
@@ -0,0 +1,113 @@
+"""Multi-megabyte prompts reach claude over stdin from every call site.
+
+A stub `claude` on PATH records its argv and stdin, so each test can check
+that the full prompt arrived on stdin and none of it in the arguments.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+from klaudimero import storage
+from klaudimero.executor import run_job
+from klaudimero.heartbeat import HEARTBEAT_SUFFIX, run_heartbeat
+from klaudimero.models import ChatMessage, ChatSession, Job
+from klaudimero.routers.chat import _run_turn
+from klaudimero.runner import PROMPT_ARGV_MAX_BYTES
+
+STUB_CLAUDE = """#!{python}
+import json, os, sys
+calls = os.environ["STUB_CLAUDE_CALLS"]
+n = len(os.listdir(calls))
+with open(os.path.join(calls, f"{{n}}.stdin"), "wb") as f:
+    f.write(sys.stdin.buffer.read())
+with open(os.path.join(calls, f"{{n}}.json"), "w") as f:
+    json.dump(sys.argv[1:], f)
+print("done")
+print("STATUS:OK")
+"""
+
+
+def _big_prompt(megabytes: int) -> str:
+    line = "Summarise the following log line: ünïcödé ✓ " + "x" * 60 + "\n"
+    return line * (megabytes * 1024 * 1024 // len(line.encode()) + 1)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _storage():
+    storage.init_storage()
+
+
+@pytest.fixture
+def claude_calls(tmp_path, monkeypatch):
+    """Put the stub claude on PATH; returns a function listing its calls."""
+    bin_dir = tmp_path / "bin"
+    calls = tmp_path / "calls"
+    bin_dir.mkdir()
+    calls.mkdir()
+    stub = bin_dir / "claude"
+    stub.write_text(STUB_CLAUDE.format(python=sys.executable))
+    stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("STUB_CLAUDE_CALLS", str(calls))
+
+    def recorded() -> list[tuple[list[str], bytes]]:
+        return [
+            (json.loads((calls / f"{n}.json").read_text()), (calls / f"{n}.stdin").read_bytes())
+            for n in range(len(list(calls.glob("*.json"))))
+        ]
+
+    return recorded
+
+
+def _assert_sent_on_stdin(call: tuple[list[str], bytes], prompt: str) -> None:
+    args, stdin = call
+    assert len(stdin) > PROMPT_ARGV_MAX_BYTES
+    assert prompt.encode() in stdin
+    assert args[0] == "-p"
+    assert all(len(arg.encode()) <= PROMPT_ARGV_MAX_BYTES for arg in args)
+
+
+def test_job_prompt_over_stdin(claude_calls):
+    prompt = _big_prompt(4)
+    job = Job(name="big", prompt=prompt, schedule="0 * * * *", notify_on=[])
+    storage.save_job(job)
+
+    execution = asyncio.run(run_job(job))
+
+    assert execution.status == "completed"
+    (call,) = claude_calls()
+    assert call[1] == prompt.encode()
+    _assert_sent_on_stdin(call, prompt)
+
+
+def test_heartbeat_prompt_over_stdin(claude_calls):
+    prompt = _big_prompt(3)
+    storage.save_heartbeat_prompt(prompt)
+
+    execution = asyncio.run(run_heartbeat())
+
+    assert execution.status == "completed"
+    (call,) = claude_calls()
+    assert call[1] == (prompt + HEARTBEAT_SUFFIX).encode()
+    _assert_sent_on_stdin(call, prompt)
+
+
+def test_chat_prompt_over_stdin(claude_calls):
+    content = _big_prompt(5)
+    session = ChatSession()
+    storage.save_chat_session(session)
+
+    response = asyncio.run(_run_turn(session, ChatMessage(role="user", content=content), 5))
+
+    assert "done" in response
+    (call,) = claude_calls()
+    _assert_sent_on_stdin(call, content)
+    stored = storage.load_chat_session(session.id)
+    assert stored.messages[0].content == content